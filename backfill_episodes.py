@@ -4,14 +4,31 @@ Backfill Planning Center Publishing Episodes
 Creates missing episodes for Sundays since August and populates them with YouTube videos
 """
 
+import argparse
+import asyncio
 import json
-import requests
-from requests.auth import HTTPBasicAuth
+import http_client
+from http_client import PCO_API, YOUTUBE_API
+import episode_cache
+import episode_engine
+import channels
+from episode_index import SUNDAY_CHANNEL_ID
+import youtube_catalogue
+from youtube_catalogue import YOUTUBE_CHANNEL_ID
+import quota_ledger
+from video_matcher import match_services
+import video_details
+import tracing
+import metrics
+import run_log
+from run_log import RunLogger
 import os
 from decouple import config
-from datetime import datetime, timedelta
-import time
+from datetime import date, datetime, timedelta
 import sys
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Load credentials
 APP_ID = config('App_ID')
@@ -21,34 +38,52 @@ YTKEY = os.environ.get('YTKEY') or config('YTKEY')
 # Setup logging
 LOG_FILE = "backfill.log"
 
-def log_message(message, also_print=True):
-    """Write message to log file and optionally print to console"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_entry = f"[{timestamp}] {message}\n"
-
-    with open(LOG_FILE, "a") as f:
-        f.write(log_entry)
+# First Sunday backfilled unless --since says otherwise
+FIRST_SUNDAY = date(2025, 8, 31)
 
-    if also_print:
-        print(message)
+# Cap on concurrent calls per API host when running with --concurrency
+HOST_CONCURRENCY = {
+    'pco': 5,
+    'youtube': 10,
+}
 
-def log_separator():
-    """Write separator line with timestamp to log file"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    separator = f"{'='*50} {timestamp} {'='*50}\n"
+# Lines are written by a background thread and flushed at exit (see run_log.py)
+_log = RunLogger(LOG_FILE)
+log_separator = _log.log_separator
 
-    with open(LOG_FILE, "a") as f:
-        f.write(separator)
+# Concurrent steps hold each item's lines and log them together (see grouped_lines)
+_held = threading.local()
+_group_lock = threading.Lock()
 
-def get_all_sundays_since_august():
-    """Get all Sunday dates from August 31, 2025 until today"""
+def log_message(message, also_print=True):
+    lines = getattr(_held, 'lines', None)
+    if lines is not None:
+        # Keep the step and HTTP fields the line has now, not those at the end of the group
+        lines.append((message, also_print, run_log.current_fields()))
+    else:
+        _log.log_message(message, also_print)
+
+@contextmanager
+def grouped_lines():
+    """Hold this thread's log lines until the block ends, then log them as one uninterrupted group"""
+    _held.lines = []
+    try:
+        yield
+    finally:
+        lines, _held.lines = _held.lines, None
+        with _group_lock:
+            for message, also_print, fields in lines:
+                _log.log_message(message, also_print, **fields)
+
+def get_all_sundays_since_august(since=FIRST_SUNDAY, until=None):
+    """Get all Sunday dates from since (August 31, 2025) until today (or until)"""
     sundays = []
 
-    # Start from August 31, 2025 (which is a Sunday)
-    start_date = datetime(2025, 8, 31).date()
-    today = datetime.now().date()
+    # Start from the first Sunday on or after since
+    start_date = since + timedelta(days=(6 - since.weekday()) % 7)
+    today = until or datetime.now().date()
 
-    # Generate all Sundays from August 31 until today
+    # Generate all Sundays from the start until today
     current_sunday = start_date
     while current_sunday <= today:
         sundays.append(current_sunday)
@@ -56,16 +91,28 @@ def get_all_sundays_since_august():
 
     return sundays
 
-def check_episode_exists(service_date):
-    """Check if an episode exists for a given date"""
+def check_episode_exists(service_date, index=None):
+    """Check if an episode exists for a given date
+
+    With a channel index (see episode_index.build_episode_index) this is a
+    dictionary lookup; otherwise it falls back to a title search request.
+    """
     service_date_str = service_date.strftime('%B %d, %Y')
     service_date_str = 'Sunday, ' + service_date_str
 
+    if index is not None:
+        episode = index.get(service_date)
+        return {
+            'exists': episode is not None,
+            'episode_id': episode['episode_id'] if episode else None,
+            'title': episode['title'] if episode else None
+        }
+
     # Search for episode by title
-    search_url = f'https://api.planningcenteronline.com/publishing/v2/channels/3708/episodes?order=-published_live_at&where[search]={service_date_str}'
+    search_url = f'{PCO_API}/channels/{SUNDAY_CHANNEL_ID}/episodes?order=-published_live_at&where[search]={service_date_str}'
 
     try:
-        response = requests.get(search_url, auth=HTTPBasicAuth(APP_ID, SECRET))
+        response = http_client.get(search_url)
 
         if response.status_code != 200:
             log_message(f"WARNING: Failed to search for {service_date_str}. HTTP {response.status_code}")
@@ -107,9 +154,9 @@ def search_youtube_for_sunday_service(service_date):
         published_before = date_before.strftime('%Y-%m-%dT23:59:59Z')
 
         search_url = (
-            f"https://www.googleapis.com/youtube/v3/search?"
+            f"{YOUTUBE_API}/search?"
             f"part=snippet&"
-            f"channelId=UCryZmERAkR6-fktliKiCGNA&"
+            f"channelId={YOUTUBE_CHANNEL_ID}&"
             f"publishedAfter={published_after}&"
             f"publishedBefore={published_before}&"
             f"maxResults=20&"
@@ -118,7 +165,7 @@ def search_youtube_for_sunday_service(service_date):
             f"key={YTKEY}"
         )
 
-        response = requests.get(search_url)
+        response = http_client.get(search_url)
 
         if response.status_code != 200:
             log_message(f"WARNING: YouTube API failed. HTTP {response.status_code}")
@@ -131,37 +178,16 @@ def search_youtube_for_sunday_service(service_date):
             log_message(f"No videos found on channel")
             return None
 
-        # Look through results for "Sunday Service" in title
-        best_match = None
-        closest_diff = 999
-
-        for item in data['items']:
-            title = item['snippet']['title']
-            video_id = item['id']['videoId']
-            published_at = item['snippet']['publishedAt']
-
-            # Check if title contains "Sunday Service" (case insensitive)
-            title_upper = title.upper()
-            if 'SUNDAY SERVICE' in title_upper:
-                # Parse published date
-                pub_date = datetime.strptime(published_at[:10], '%Y-%m-%d').date()
-
-                # Calculate date difference
-                date_diff = abs((pub_date - service_date).days)
-
-                # Allow videos published within 3 days of the service (before or after)
-                if date_diff <= 3:
-                    log_message(f"  Candidate: '{title}' (ID: {video_id}, published: {pub_date}, diff: {date_diff} days)")
-
-                    # Keep track of closest match
-                    if date_diff < closest_diff:
-                        closest_diff = date_diff
-                        best_match = {
-                            'video_id': video_id,
-                            'title': title,
-                            'published_at': published_at,
-                            'date_diff': date_diff
-                        }
+        # Look through results for "Sunday Service" in title, within 3 days of the service
+        videos = [
+            {
+                'video_id': item['id']['videoId'],
+                'title': item['snippet']['title'],
+                'published_at': item['snippet']['publishedAt']
+            }
+            for item in data['items']
+        ]
+        best_match = match_services([service_date], videos).get(service_date)
 
         if best_match:
             log_message(f"Found match: '{best_match['title']}' (ID: {best_match['video_id']}, {best_match['date_diff']} days difference)")
@@ -176,184 +202,84 @@ def search_youtube_for_sunday_service(service_date):
         traceback.print_exc()
         return None
 
-def create_episode_with_video(service_date, youtube_video):
-    """Create a new episode and populate it with YouTube video"""
+def create_episode_with_video(service_date, youtube_video, index=None):
+    """Create a new episode and populate it with YouTube video
+
+    The episode is made by episode_engine.create_episode, so the claim that
+    keeps two runs from creating the same Sunday, and the repair of an episode
+    whose PATCHes failed last time, apply to backfilled Sundays too.
+    """
 
     service_date_str = service_date.strftime('%B %d, %Y')
     service_title = 'Sunday, ' + service_date_str
 
-    # Calculate timestamps
-    date_str = service_date.strftime('%Y-%m-%d')
-    starts_at = date_str + 'T13:45:00Z'
-    starts_at_pco = date_str + 'T13:45:00+00:00'
-
     log_message(f"\n--- Creating Episode: {service_title} ---")
 
-    # Step 1: Create episode
-    episode_url = 'https://api.planningcenteronline.com/publishing/v2/channels/3708/episodes'
-    episode_payload = {
-        "data": {
-            "attributes": {
-                "published_to_library_at": starts_at,
-                "title": service_title
-            }
-        }
-    }
+    video = {'video_id': youtube_video['video_id']}
 
+    # The description is written with the library video URL, in the same PATCH
     try:
-        log_message(f"Creating episode...")
-        response = requests.post(
-            episode_url,
-            auth=HTTPBasicAuth(APP_ID, SECRET),
-            json=episode_payload
-        )
+        log_message(f"Fetching YouTube video description...")
 
-        if response.status_code not in [200, 201]:
-            log_message(f"ERROR: Failed to create episode. HTTP {response.status_code}")
-            log_message(f"Response: {response.text}")
-            return False
+        # Normally already cached by the batched prefetch in main()
+        description = video_details.get_description(youtube_video['video_id'], YTKEY)
 
-        episode_data = response.json()
-        episode_id = episode_data['data']['id']
-        log_message(f"✓ Episode created: ID {episode_id}")
+        if description is None:
+            log_message(f"WARNING: No video details found for {youtube_video['video_id']}")
+        elif description:
+            video['description'] = description
+        else:
+            log_message(f"Video has no description")
 
     except Exception as e:
-        log_message(f"ERROR: Exception creating episode: {e}")
-        return False
+        log_message(f"WARNING: Exception fetching video description: {e}")
+        # Continue anyway
 
-    # Step 2: Get episode time ID
     try:
-        log_message(f"Getting episode time ID...")
-        episode_times_url = f'https://api.planningcenteronline.com/publishing/v2/episodes/{episode_id}/episode_times'
-        response = requests.get(episode_times_url, auth=HTTPBasicAuth(APP_ID, SECRET))
-
-        if response.status_code != 200:
-            log_message(f"ERROR: Failed to get episode times. HTTP {response.status_code}")
-            return False
-
-        times_data = response.json()
-        if 'data' not in times_data or len(times_data['data']) == 0:
-            log_message(f"ERROR: No episode times found")
-            return False
-
-        episode_time_id = times_data['data'][0]['id']
-        log_message(f"✓ Episode time ID: {episode_time_id}")
-
+        result = episode_engine.create_episode(channels.get('sunday'), service_date, log=log_message,
+                                               api_key=YTKEY, index=index, video=video)
     except Exception as e:
-        log_message(f"ERROR: Exception getting episode time: {e}")
+        log_message(f"ERROR: Exception creating episode: {e}")
         return False
 
-    # Step 3: Update episode time with YouTube video embed
-    try:
-        log_message(f"Updating episode time with YouTube video {youtube_video['video_id']}...")
-
-        video_embed_payload = {
-            "data": {
-                "attributes": {
-                    "starts_at": starts_at,
-                    "video_embed_code": (
-                        f"<iframe width='560' height='315' "
-                        f"src='https://www.youtube.com/embed/{youtube_video['video_id']}' "
-                        "frameborder='0' allow='accelerometer; autoplay; "
-                        "clipboard-write; encrypted-media; gyroscope; "
-                        "picture-in-picture; web-share' allowfullscreen></iframe>"
-                    )
-                }
-            }
-        }
-
-        episode_time_url = f'https://api.planningcenteronline.com/publishing/v2/episodes/{episode_id}/episode_times/{episode_time_id}'
-        response = requests.patch(
-            episode_time_url,
-            auth=HTTPBasicAuth(APP_ID, SECRET),
-            json=video_embed_payload
-        )
+    if result is None:
+        return False
 
-        if response.status_code not in [200, 201]:
-            log_message(f"WARNING: Episode time update returned HTTP {response.status_code}")
-            log_message(f"Response: {response.text}")
-        else:
-            log_message(f"✓ Episode time updated")
+    log_message(f"✓ Episode {result['episode_id']} created and populated successfully")
+    return True
 
-    except Exception as e:
-        log_message(f"ERROR: Exception updating episode time: {e}")
-        # Continue anyway - episode is created
+async def _run_concurrently(func, items, limit):
+    """Run func over items in worker threads with at most `limit` calls in flight"""
+    semaphore = asyncio.Semaphore(limit)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=limit))
 
-    # Step 4: Update episode with library video URL
-    try:
-        log_message(f"Updating library video URL...")
-
-        library_url = f"https://www.youtube.com/watch?v={youtube_video['video_id']}"
-        library_payload = {
-            "data": {
-                "attributes": {
-                    "library_video_url": library_url,
-                    "published_to_library_at": starts_at_pco
-                }
-            }
-        }
+    async def run_one(item):
+        async with semaphore:
+            return await asyncio.to_thread(func, item)
 
-        episode_update_url = f'https://api.planningcenteronline.com/publishing/v2/episodes/{episode_id}'
-        response = requests.patch(
-            episode_update_url,
-            auth=HTTPBasicAuth(APP_ID, SECRET),
-            json=library_payload
-        )
+    return await asyncio.gather(*(run_one(item) for item in items))
 
-        if response.status_code not in [200, 201]:
-            log_message(f"WARNING: Library URL update returned HTTP {response.status_code}")
-            log_message(f"Response: {response.text}")
-        else:
-            log_message(f"✓ Library video URL updated")
+def run_step(func, items, concurrency=None, host='pco'):
+    """Call func for every item and return the results in item order
 
-    except Exception as e:
-        log_message(f"ERROR: Exception updating library URL: {e}")
-        # Continue anyway
+    Without a concurrency level the calls run one at a time; otherwise they run
+    concurrently, capped per host, and each call's log lines are written
+    together once it finishes. Pacing against the PCO rate limit is left to
+    the shared limiter in http_client.
+    """
+    if not concurrency:
+        return [func(item) for item in items]
 
-    # Step 5: Get and update YouTube video description
-    try:
-        log_message(f"Fetching YouTube video description...")
+    def grouped(item):
+        # One item's lines stay together instead of interleaving with the others'
+        with grouped_lines():
+            return func(item)
 
-        video_details_url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet&id={youtube_video['video_id']}&key={YTKEY}"
-        response = requests.get(video_details_url)
-
-        if response.status_code == 200:
-            video_data = response.json()
-            if 'items' in video_data and len(video_data['items']) > 0:
-                description = video_data['items'][0]['snippet']['description']
-
-                if description:
-                    description_payload = {
-                        "data": {
-                            "attributes": {
-                                "description": description
-                            }
-                        }
-                    }
-
-                    response = requests.patch(
-                        episode_update_url,
-                        auth=HTTPBasicAuth(APP_ID, SECRET),
-                        json=description_payload
-                    )
-
-                    if response.status_code in [200, 201]:
-                        log_message(f"✓ Episode description updated ({len(description)} characters)")
-                    else:
-                        log_message(f"WARNING: Description update returned HTTP {response.status_code}")
-                else:
-                    log_message(f"Video has no description")
-        else:
-            log_message(f"WARNING: Failed to fetch video details. HTTP {response.status_code}")
+    limit = min(concurrency, HOST_CONCURRENCY[host])
+    return asyncio.run(_run_concurrently(grouped, items, limit))
 
-    except Exception as e:
-        log_message(f"WARNING: Exception fetching video description: {e}")
-        # Continue anyway
-
-    log_message(f"✓ Episode {episode_id} created and populated successfully")
-    return True
-
-def main():
+def main(concurrency=None, since=FIRST_SUNDAY, until=None):
     log_separator()
     log_message("=== Starting Backfill Process ===")
 
@@ -361,9 +287,15 @@ def main():
         log_message("ERROR: YTKEY environment variable not found")
         return 1
 
-    # Get all Sundays since August 31, 2025
-    log_message("\n--- Step 1: Finding all Sundays since August 31, 2025 ---")
-    sundays = get_all_sundays_since_august()
+    if concurrency:
+        log_message(f"Running concurrently (concurrency {concurrency})")
+
+    # Get all Sundays since August 31, 2025 (or --since)
+    log_message(f"\n--- Step 1: Finding all Sundays since {since:%B %d, %Y} ---")
+    sundays = get_all_sundays_since_august(since, until)
+    if not sundays:
+        log_message("No Sundays in the requested range")
+        return 0
     log_message(f"Found {len(sundays)} Sundays from {sundays[0]} to {sundays[-1]}")
 
     # Check which episodes are missing
@@ -371,26 +303,41 @@ def main():
     missing_episodes = []
     existing_episodes = []
 
-    for sunday in sundays:
+    # Local cache of the channel (synced incrementally) instead of one search per Sunday
+    try:
+        index = episode_cache.load_index()
+        log_message(f"Indexed {len(index)} channel episodes")
+    except Exception as e:
+        log_message(f"WARNING: Could not index channel episodes ({e}) - searching per Sunday")
+        index = None
+
+    def check_sunday(sunday):
         service_date_str = sunday.strftime('%B %d, %Y')
         log_message(f"Checking {service_date_str}...")
 
-        result = check_episode_exists(sunday)
+        with tracing.span('episode_check'):
+            result = check_episode_exists(sunday, index)
 
         if result is None:
             log_message(f"  ERROR: Could not check episode status")
-            continue
+        elif result['exists']:
+            log_message(f"  ✓ Episode exists: {result['episode_id']}")
+        else:
+            log_message(f"  ✗ Episode missing")
 
+        return result
+
+    # Against the index each check is a dictionary lookup - threads only help the per-Sunday searches
+    results = run_step(check_sunday, sundays, concurrency if index is None else None, host='pco')
+
+    for sunday, result in zip(sundays, results):
+        if result is None:
+            continue
         if result['exists']:
-            log_message(f"  ✓ Episode exists: {result['episode_id']}")
             existing_episodes.append(sunday)
         else:
-            log_message(f"  ✗ Episode missing")
             missing_episodes.append(sunday)
 
-        # Rate limit - be nice to the API
-        time.sleep(0.5)
-
     log_message(f"\nSummary: {len(existing_episodes)} existing, {len(missing_episodes)} missing")
 
     if len(missing_episodes) == 0:
@@ -401,23 +348,67 @@ def main():
     log_message("\n--- Step 3: Searching YouTube for missing episodes ---")
     episodes_to_create = []
 
-    for sunday in missing_episodes:
+    # Backfill only spends YouTube quota above the reserve kept for the live update
+    quota = http_client.youtube_quota
+    quota.priority = 'background'
+    search_dates = set(missing_episodes)
+
+    # One incremental read of the uploads playlist covers every missing Sunday,
+    # and one matching pass assigns each upload to at most one Sunday
+    try:
+        with tracing.span('catalogue_sync'):
+            new_videos = youtube_catalogue.sync(YTKEY)
+        log_message(f"YouTube catalogue synced ({new_videos} new uploads)")
+        catalogue_matches = youtube_catalogue.match_sunday_services(missing_episodes)
+        use_catalogue = True
+    except quota_ledger.QuotaBudgetError as e:
+        log_message(f"\nYouTube lookups delayed until the quota resets at {quota_ledger.resets_at():%Y-%m-%d %H:%M %Z}: {e}")
+        log_message(f"YouTube quota: {quota.summary()}")
+        return 0
+    except Exception as e:
+        log_message(f"WARNING: Could not sync YouTube catalogue ({e}) - searching per Sunday")
+        use_catalogue = False
+
+        # Per-Sunday searches cost 100 units each - search the most recent Sundays the
+        # budget covers and leave the rest for a later run
+        affordable = quota.available() // quota_ledger.COSTS['search']
+        if affordable < len(missing_episodes):
+            search_dates = set(missing_episodes[len(missing_episodes) - affordable:])
+            log_message(f"Quota budget covers {affordable} of {len(missing_episodes)} searches - "
+                        f"the other {len(missing_episodes) - affordable} Sundays wait for a later run")
+
+    def search_sunday(sunday):
         service_date_str = sunday.strftime('%B %d, %Y')
         log_message(f"\nSearching YouTube for {service_date_str}...")
 
-        youtube_video = search_youtube_for_sunday_service(sunday)
+        if use_catalogue:
+            youtube_video = catalogue_matches.get(sunday)
+            if youtube_video:
+                log_message(f"Found match: '{youtube_video['title']}' (ID: {youtube_video['video_id']}, {youtube_video['date_diff']} days difference)")
+            else:
+                log_message(f"No Sunday Service video found for {sunday}")
+        elif sunday in search_dates:
+            with tracing.span('youtube_search'):
+                youtube_video = search_youtube_for_sunday_service(sunday)
+        else:
+            log_message(f"Skipped - over the YouTube quota budget")
+            youtube_video = None
 
         if youtube_video:
-            episodes_to_create.append({
-                'date': sunday,
-                'youtube': youtube_video
-            })
             log_message(f"  ✓ Will create episode with video: {youtube_video['title']}")
         else:
             log_message(f"  ✗ No video found - skipping")
 
-        # Rate limit for YouTube API
-        time.sleep(1)
+        return youtube_video
+
+    videos = run_step(search_sunday, missing_episodes, concurrency, host='youtube')
+
+    for sunday, youtube_video in zip(missing_episodes, videos):
+        if youtube_video:
+            episodes_to_create.append({
+                'date': sunday,
+                'youtube': youtube_video
+            })
 
     log_message(f"\nFound YouTube videos for {len(episodes_to_create)} missing episodes")
 
@@ -431,33 +422,63 @@ def main():
     for ep in episodes_to_create:
         log_message(f"  - {ep['date'].strftime('%B %d, %Y')}: {ep['youtube']['title']}")
 
-    log_message("\nStarting creation process...")
+    # Descriptions for every matched video in ceil(n / 50) videos.list calls
+    try:
+        with tracing.span('description_prefetch'):
+            video_details.fetch_snippets([ep['youtube']['video_id'] for ep in episodes_to_create], YTKEY)
+    except Exception as e:
+        log_message(f"WARNING: Could not prefetch video descriptions ({e}) - fetching per episode")
 
-    created_count = 0
-    failed_count = 0
+    log_message("\nStarting creation process...")
 
-    for ep in episodes_to_create:
-        success = create_episode_with_video(ep['date'], ep['youtube'])
+    def create_episode(ep):
+        with tracing.span('episode_create'):
+            # Existence was checked in step 2 - no second sync of the channel per Sunday
+            return create_episode_with_video(ep['date'], ep['youtube'], index if index is not None else {})
 
-        if success:
-            created_count += 1
-        else:
-            failed_count += 1
+    outcomes = run_step(create_episode, episodes_to_create, concurrency, host='pco')
 
-        # Rate limit between episode creations
-        time.sleep(2)
+    created_count = sum(1 for success in outcomes if success)
+    failed_count = len(outcomes) - created_count
+    metrics.gauge('backfill_episodes', created_count, result='created')
+    metrics.gauge('backfill_episodes', failed_count, result='failed')
+    metrics.gauge('backfill_episodes', len(missing_episodes) - len(episodes_to_create), result='not_found')
 
     log_message(f"\n=== Backfill Complete ===")
     log_message(f"Created: {created_count}")
     log_message(f"Failed: {failed_count}")
     log_message(f"Total missing: {len(missing_episodes)}")
     log_message(f"Not found on YouTube: {len(missing_episodes) - len(episodes_to_create)}")
+    log_message(f"Rate limit waits: {http_client.pco_rate_limiter.waited:.1f}s")
+    log_message(f"HTTP retries: {http_client.retry_policy.stats.summary()}")
+    log_message(f"YouTube quota: {quota.summary()}")
 
     return 0 if failed_count == 0 else 1
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill missing Sunday episodes from YouTube")
+    parser.add_argument(
+        '--concurrency', type=int, default=None, metavar='N',
+        help="run checks, YouTube lookups and creations concurrently with up to N calls in flight"
+    )
+    parser.add_argument(
+        '--since', type=date.fromisoformat, default=FIRST_SUNDAY, metavar='YYYY-MM-DD',
+        help=f"first Sunday to backfill (default {FIRST_SUNDAY})"
+    )
+    parser.add_argument(
+        '--until', type=date.fromisoformat, default=None, metavar='YYYY-MM-DD',
+        help="last day to backfill (default today)"
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    return args
+
 if __name__ == "__main__":
+    exit_code = 1
     try:
-        exit_code = main()
+        args = parse_args()
+        exit_code = main(concurrency=args.concurrency, since=args.since, until=args.until)
         sys.exit(exit_code)
     except KeyboardInterrupt:
         log_message("\nBackfill interrupted by user")
@@ -467,3 +488,6 @@ if __name__ == "__main__":
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        log_message(tracing.report())
+        metrics.write('backfill_episodes', exit_code == 0)
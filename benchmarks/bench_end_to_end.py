@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark against the mock APIs
+Runs the main.py create, the updateyoutube.py live update and a 52-Sunday backfill_episodes.py run
+against mock_api.py with fixed latency, records wall time, requests, response bytes and peak RSS,
+and fails when a metric regresses past its threshold over the stored baseline
+
+Wall time and RSS depend on the machine: refresh the baseline with --update on the machine
+that runs the gate, and commit it with the change that moved the numbers.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_api import MockAPI, MockData, last_sunday_before
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_end_to_end.json')
+
+# Every mock endpoint answers after this many milliseconds
+LATENCY_MS = 50
+
+BACKFILL_SUNDAYS = 52
+
+# metric: (allowed growth as a fraction of the baseline, absolute slack for noise)
+THRESHOLDS = {
+    'wall_seconds': (0.20, 0.25),
+    'requests': (0.0, 0),
+    'response_bytes': (0.05, 1024),
+    'peak_rss_kb': (0.15, 4096),
+}
+METRICS = list(THRESHOLDS)
+
+
+def backfill_args(data):
+    last = last_sunday_before(data.today)
+    first = last - timedelta(weeks=BACKFILL_SUNDAYS - 1)
+    return ['backfill_episodes.py', '--since', first.isoformat(), '--until', last.isoformat()]
+
+
+# name: (setup scripts run first, unmeasured; the measured script) - each is a function of the seeded data
+FLOWS = {
+    'create': (lambda data: [], lambda data: ['main.py']),
+    # main.py has run in the morning, as on a Sunday; the broadcast is already live
+    'live_update': (lambda data: [['main.py']], lambda data: ['updateyoutube.py']),
+    'backfill': (lambda data: [], backfill_args),
+}
+
+
+def run_script(argv, env, workdir):
+    """Run one script to completion; returns (seconds, peak RSS in KiB, exit code)"""
+    with open(os.path.join(workdir, 'output.txt'), 'a') as output:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, argv[0])] + argv[1:],
+                                   cwd=workdir, env=env, stdout=output, stderr=subprocess.STDOUT)
+        # wait4 gives this child's own rusage, not the maximum over every child so far
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return elapsed, usage.ru_maxrss, process.returncode
+
+
+def run_flow(name, seed, latency):
+    """One run of a flow against a freshly seeded mock and empty local state"""
+    setup, measured = FLOWS[name]
+    data = MockData(seed=seed, sundays=BACKFILL_SUNDAYS, live_after=0)
+    mock = MockAPI(data, latency={'*': latency}, seed=seed).start()
+
+    try:
+        with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+            env = dict(
+                os.environ,
+                **mock.environment(),
+                App_ID='bench', Secret='bench', YTKEY='bench',
+                CACHE_DB=os.path.join(workdir, 'cache.sqlite3'),
+                METRICS_DIR=os.path.join(workdir, 'metrics'),
+                TRACE_FILE=os.path.join(workdir, 'traces.jsonl'),
+                # Unknown paths get an immediate 404 from the mock and are not counted
+                HEALTHCHECK_BASE=f"http://{mock.host}:{mock.servers['pco'].server_port}/healthcheck",
+                WEBSUB_CALLBACK='',
+            )
+
+            for argv in setup(data):
+                _, _, code = run_script(argv, env, workdir)
+                if code != 0:
+                    raise RuntimeError(f"{name}: setup {argv[0]} exited {code}\n{_tail(workdir)}")
+
+            before = mock.snapshot()
+            seconds, rss, code = run_script(measured(data), env, workdir)
+            after = mock.snapshot()
+            if code != 0:
+                raise RuntimeError(f"{name}: {measured(data)[0]} exited {code}\n{_tail(workdir)}")
+    finally:
+        mock.stop()
+
+    return {
+        'wall_seconds': round(seconds, 3),
+        'requests': after['total'] - before['total'],
+        'response_bytes': after['bytes_sent'] - before['bytes_sent'],
+        'peak_rss_kb': rss,
+    }
+
+
+def _tail(workdir, lines=20):
+    with open(os.path.join(workdir, 'output.txt')) as f:
+        return ''.join(f.readlines()[-lines:])
+
+
+def benchmark(flows, repeat, seed, latency):
+    """{flow: median of each metric over `repeat` runs}"""
+    results = {}
+    for name in flows:
+        runs = [run_flow(name, seed, latency) for _ in range(repeat)]
+        results[name] = {metric: statistics.median(run[metric] for run in runs) for metric in METRICS}
+        print(f"{name:<12} " + '  '.join(f"{metric} {results[name][metric]}" for metric in METRICS), flush=True)
+    return results
+
+
+def compare(results, baseline):
+    """Print each metric against the baseline; returns the regressions"""
+    regressions = []
+    print(f"\n{'flow':<12} {'metric':<15} {'baseline':>12} {'current':>12} {'change':>8}  limit")
+    for name, current in results.items():
+        base = baseline['flows'].get(name)
+        if base is None:
+            print(f"{name:<12} (no baseline)")
+            continue
+        for metric, (fraction, slack) in THRESHOLDS.items():
+            limit = base[metric] * (1 + fraction) + slack
+            change = (current[metric] - base[metric]) / base[metric] * 100 if base[metric] else 0.0
+            failed = current[metric] > limit
+            print(f"{name:<12} {metric:<15} {base[metric]:>12} {current[metric]:>12} {change:>+7.1f}%  "
+                  f"{limit:.6g}{'  REGRESSION' if failed else ''}")
+            if failed:
+                regressions.append((name, metric))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--flow', action='append', choices=list(FLOWS), help="only this flow (repeatable)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per flow; the median is kept")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=LATENCY_MS, help="mock latency per request in ms")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Results are only comparable with a baseline recorded under the same settings
+    settings = {'latency_ms': args.latency, 'seed': args.seed, 'backfill_sundays': BACKFILL_SUNDAYS}
+    results = benchmark(args.flow or list(FLOWS), args.repeat, args.seed, args.latency)
+    document = {'settings': settings, 'repeat': args.repeat, 'python': platform.python_version(), 'flows': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    if args.update:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            if previous['settings'] == settings:
+                document['flows'] = dict(previous['flows'], **results)
+        with open(args.baseline, 'w') as f:
+            json.dump(document, f, indent=2)
+            f.write('\n')
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline} - run with --update to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['settings'] != settings:
+        print(f"\nBaseline was recorded with {baseline['settings']}, not {settings} - not comparable")
+        return 2
+
+    regressions = compare(results, baseline)
+    if regressions:
+        print(f"\n{len(regressions)} regressions: {', '.join(f'{flow} {metric}' for flow, metric in regressions)}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark for video_matcher.match_services
+Generates a synthetic channel (tens of thousands of uploads) and times one matching pass
+over every Sunday in the range, optionally against the old per-date scan
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from video_matcher import match_services
+
+START = date(2006, 1, 1)
+
+
+def synthetic_channel(video_count, years, seed):
+    """Weekly Sunday Service uploads (some late, some missing) padded out with other uploads"""
+    rng = random.Random(seed)
+    videos = []
+    sundays = []
+
+    day = START + timedelta(days=(6 - START.weekday()) % 7)
+    end = START + timedelta(days=365 * years)
+    while day < end:
+        sundays.append(day)
+        if rng.random() < 0.95:
+            published = day + timedelta(days=rng.choice([0, 0, 0, 1, 2]))
+            videos.append({
+                'video_id': f'svc{len(videos)}',
+                'title': f'Sunday Service - {day:%B %d, %Y}',
+                'published_at': f'{published}T15:00:00Z'
+            })
+        day += timedelta(days=7)
+
+    span = (end - START).days
+    while len(videos) < video_count:
+        published = START + timedelta(days=rng.randrange(span))
+        videos.append({
+            'video_id': f'clip{len(videos)}',
+            'title': rng.choice(['Youth Night', 'Worship Set', 'Announcements', 'Sunday Service Highlights']),
+            'published_at': f'{published}T{rng.randrange(24):02d}:00:00Z'
+        })
+
+    rng.shuffle(videos)
+    return sundays, videos
+
+
+def naive_match(service_dates, videos, max_days=3):
+    """The original per-date loop from search_youtube_for_sunday_service"""
+    matches = {}
+    for service_date in service_dates:
+        best_match = None
+        for video in videos:
+            if 'SUNDAY SERVICE' not in video['title'].upper():
+                continue
+            pub_date = datetime.strptime(video['published_at'][:10], '%Y-%m-%d').date()
+            date_diff = abs((pub_date - service_date).days)
+            if date_diff <= max_days and (best_match is None or date_diff < best_match['date_diff']):
+                best_match = dict(video, date_diff=date_diff)
+        if best_match:
+            matches[service_date] = best_match
+    return matches
+
+
+def timed(func, *args, repeat=1):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--videos', type=int, default=50000)
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--naive', action='store_true', help="also time the original per-date scan")
+    args = parser.parse_args(argv)
+
+    sundays, videos = synthetic_channel(args.videos, args.years, args.seed)
+    print(f"{len(videos)} videos, {len(sundays)} Sundays")
+
+    matches, elapsed = timed(match_services, sundays, videos, repeat=args.repeat)
+    used = [match['video_id'] for match in matches.values()]
+    print(f"match_services: {elapsed * 1000:.1f} ms, {len(matches)} matched, "
+          f"{len(used) - len(set(used))} double assignments")
+
+    if args.naive:
+        naive, elapsed = timed(naive_match, sundays, videos)
+        used = [match['video_id'] for match in naive.values()]
+        print(f"per-date scan:  {elapsed * 1000:.1f} ms, {len(naive)} matched, "
+              f"{len(used) - len(set(used))} double assignments")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Channel definitions
+One entry per Planning Center publishing channel: where its episodes live, which YouTube channel
+streams them, when the service is and how its episodes are titled and embedded
+"""
+
+import json
+
+from decouple import config
+
+from episode_index import SUNDAY_CHANNEL_ID
+from youtube_catalogue import YOUTUBE_CHANNEL_ID
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Embed used once the service's own video is known
+VIDEO_EMBED = (
+    "<iframe width='560' height='315' "
+    "src='https://www.youtube.com/embed/{video_id}' "
+    "frameborder='0' allow='accelerometer; autoplay; "
+    "clipboard-write; encrypted-media; gyroscope; "
+    "picture-in-picture; web-share' allowfullscreen></iframe>"
+)
+
+# name: key used on the command line and in logs
+# pco_channel_id / youtube_channel_id: where episodes are created / streamed
+# weekday, starts_at: service day and start time (UTC)
+# title: str.format template, given the service date as {date}
+# embed: episode_time embed before the service's video is known
+# live: look up the scheduled broadcast at creation and run the live update
+# healthchecks: healthchecks.io check ids pinged by the channel's 'create' and 'live' runs
+#
+# CHANNELS_FILE (a JSON list of the same entries) replaces this table.
+CHANNELS = [
+    {
+        'name': 'sunday',
+        'pco_channel_id': SUNDAY_CHANNEL_ID,
+        'youtube_channel_id': YOUTUBE_CHANNEL_ID,
+        'weekday': 'Sunday',
+        'starts_at': '13:45',
+        'title': 'Sunday, {date:%B %d, %Y}',
+        'embed': (
+            '<iframe width="560" height="315"\n'
+            '                 src="https://www.youtube.com/embed/live_stream?autoplay=1&amp;channel=RaDDkBdBMRA&amp;playsinline=1"\n'
+            '                 frameborder="0" allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture"\n'
+            '                 allowfullscreen></iframe>'
+        ),
+        'live': True,
+        'healthchecks': {
+            'create': '0996324d-68a4-4098-a8ce-84152a1c132a',
+            'live': '78356338-0428-4f04-ad71-b3f805264745',
+        },
+    },
+    {
+        'name': 'wednesday',
+        'pco_channel_id': '12961',
+        'youtube_channel_id': YOUTUBE_CHANNEL_ID,
+        'weekday': 'Wednesday',
+        'starts_at': '13:45',
+        'title': 'Wednesday, {date:%B %d, %Y}',
+        'embed': (
+            '<iframe width="560" height="315" src="https://www.youtube.com/embed/FBy7kse0Wvc" frameborder="0" '
+            'allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture" '
+            'allowfullscreen></iframe>'
+        ),
+        'live': False,
+        'healthchecks': {},
+    },
+]
+CHANNELS_FILE = config('CHANNELS_FILE', default='')
+
+REQUIRED = ('name', 'pco_channel_id', 'youtube_channel_id', 'weekday', 'starts_at', 'title', 'embed')
+
+_channels = None
+
+
+def load_channels(path=CHANNELS_FILE):
+    """Validated copies of the channel table (or of CHANNELS_FILE when set)"""
+    entries = CHANNELS
+    if path:
+        with open(path) as f:
+            entries = json.load(f)
+
+    channels = []
+    for entry in entries:
+        missing = [key for key in REQUIRED if key not in entry]
+        if missing:
+            raise ValueError(f"Channel {entry.get('name', '?')} is missing {', '.join(missing)}")
+        if entry['weekday'] not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday for channel {entry['name']}: {entry['weekday']}")
+
+        channel = dict(entry, live=entry.get('live', False), healthchecks=entry.get('healthchecks', {}))
+        channel['pco_channel_id'] = str(channel['pco_channel_id'])
+        channels.append(channel)
+    return channels
+
+
+def all_channels():
+    global _channels
+
+    if _channels is None:
+        _channels = load_channels()
+    return _channels
+
+
+def get(name):
+    for channel in all_channels():
+        if channel['name'] == name:
+            return channel
+    raise KeyError(f"No channel named {name}")
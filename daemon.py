@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Scheduler daemon
+Runs every channel's episode create and, for live channels, the live update in one long-running
+process instead of separate cron launches, keeping HTTP pools and caches warm between jobs
+"""
+
+import argparse
+import importlib
+import json
+import signal
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from decouple import config
+
+import http_client
+from http_client import PCO_API, YOUTUBE_API
+import episode_cache
+import channels
+from channels import WEEKDAYS
+import run_log
+import tracing
+import metrics
+import healthcheck
+from run_log import RunLogger
+
+# Minutes before a channel's service start that its episode is created, and that the
+# live update starts watching for the stream (live channels only)
+CREATE_LEAD = 105
+LIVE_LEAD = 5
+
+# The schedule is built from the channel table (see channel_schedule). SCHEDULE_FILE (a
+# JSON list of the same entries) replaces it: job is the module whose main() is called,
+# with the entry's channel when it names one; times are UTC like the channels' starts_at.
+SCHEDULE_FILE = config('SCHEDULE_FILE', default='')
+
+STATUS_HOST = config('DAEMON_STATUS_HOST', default='127.0.0.1')
+STATUS_PORT = config('DAEMON_STATUS_PORT', default=8088, cast=int)
+
+# Seconds before a job to re-open its connections and bring the episode cache up to date
+WARMUP = 120
+
+LOG_FILE = "daemon.log"
+
+
+# Lines are written by a background thread and flushed at exit (see run_log.py)
+_log = RunLogger(LOG_FILE)
+log_message = _log.log_message
+log_separator = _log.log_separator
+
+
+def _before(weekday, starts_at, minutes):
+    """(weekday, 'HH:MM') `minutes` before starts_at on weekday, wrapping into the previous day"""
+    hour, minute = (int(part) for part in starts_at.split(':'))
+    at = (WEEKDAYS.index(weekday) * 1440 + hour * 60 + minute - minutes) % (7 * 1440)
+    return WEEKDAYS[at // 1440], f"{at % 1440 // 60:02d}:{at % 60:02d}"
+
+
+def channel_schedule(table=None):
+    """One create job per channel and one live update job per live channel, timed from its service start"""
+    entries = []
+    for channel in table if table is not None else channels.all_channels():
+        weekday, at = _before(channel['weekday'], channel['starts_at'], CREATE_LEAD)
+        entries.append({'name': f"{channel['name']}-create", 'job': 'main', 'channel': channel['name'],
+                        'weekday': weekday, 'time': at})
+        if channel['live']:
+            weekday, at = _before(channel['weekday'], channel['starts_at'], LIVE_LEAD)
+            entries.append({'name': f"{channel['name']}-live", 'job': 'updateyoutube', 'channel': channel['name'],
+                            'weekday': weekday, 'time': at})
+    return entries
+
+
+def load_schedule(path=SCHEDULE_FILE):
+    entries = channel_schedule()
+    if path:
+        with open(path) as f:
+            entries = json.load(f)
+    entries = [dict(entry) for entry in entries]
+
+    for entry in entries:
+        if entry['weekday'] not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday in schedule entry {entry['name']}: {entry['weekday']}")
+        hour, minute = (int(part) for part in entry['time'].split(':'))
+        entry['at'] = (WEEKDAYS.index(entry['weekday']), hour, minute)
+    return entries
+
+
+def next_run(entry, after):
+    """First time after `after` (aware, UTC) that the entry is due"""
+    weekday, hour, minute = entry['at']
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    candidate += timedelta(days=(weekday - candidate.weekday()) % 7)
+    if candidate <= after:
+        candidate += timedelta(days=7)
+    return candidate
+
+
+class Job:
+    """One schedule entry with its next run time and last result"""
+
+    def __init__(self, entry, now):
+        self.name = entry['name']
+        self.entry = entry
+        self.module = importlib.import_module(entry['job'])
+        self.next_run = next_run(entry, now)
+        self.warmed = False
+        self.last = None
+
+    def run(self, alone=True):
+        """Call the job's main() and record how it went
+
+        The scripts only call exit() when they fail, so SystemExit counts as a
+        failure like any exception; a plain return counts as success.
+
+        alone is False when other jobs are already running: the run id,
+        metrics, quota spend and quota priority are process-wide, so this job
+        joins their run instead of resetting it under them.
+        """
+        # Spans from the warm-up belong to the previous run id - export them first
+        tracing.flush()
+        started = datetime.now(timezone.utc)
+        result, error = 'ok', None
+        if alone:
+            run_log.start_run()
+            metrics.start_run()
+            http_client.youtube_quota.spent.clear()
+
+            # updateyoutube.py raises its own priority; every other job is 'normal'
+            http_client.youtube_quota.priority = 'normal'
+        run_id = run_log.run_id()
+
+        # Each channel pings its own check (see channels.py), never another channel's
+        channel = [self.entry['channel']] if 'channel' in self.entry else []
+        check_url = getattr(self.module, 'healthcheck_url', None)
+        monitor = healthcheck.Monitor(check_url(*channel) if check_url else None)
+        monitor.start()
+
+        try:
+            self.module.main(*channel)
+        except SystemExit as e:
+            result, error = 'failed', f"exit({e.code})"
+        except Exception as e:
+            result, error = 'failed', str(e)
+
+        if result == 'ok':
+            monitor.success(0)
+        else:
+            monitor.fail(error)
+
+        log_message(tracing.report())
+        tracing.flush()
+        metrics.write(self.name, result == 'ok')
+
+        finished = datetime.now(timezone.utc)
+        self.last = {
+            'run_id': run_id,
+            'started': started.isoformat(),
+            'finished': finished.isoformat(),
+            'seconds': round((finished - started).total_seconds(), 2),
+            'result': result,
+            'error': error,
+        }
+        return result
+
+    def status(self):
+        return {
+            'name': self.name,
+            'job': self.entry['job'],
+            'channel': self.entry.get('channel'),
+            'weekday': self.entry['weekday'],
+            'time': self.entry['time'],
+            'next_run': self.next_run.isoformat(),
+            'last_run': self.last,
+        }
+
+
+def warm_up(job):
+    """Re-open pooled connections and sync the job's channel in the episode cache shortly before it"""
+    for url in (PCO_API, YOUTUBE_API):
+        http_client.warm(url)
+    # An entry without a channel (SCHEDULE_FILE) has no episodes of its own to sync
+    if 'channel' in job.entry:
+        try:
+            episode_cache.sync(channels.get(job.entry['channel'])['pco_channel_id'])
+        except Exception as e:
+            log_message(f"WARNING: Could not sync episode cache before {job.name}: {e}")
+    job.warmed = True
+
+
+class Daemon:
+    def __init__(self, schedule):
+        now = datetime.now(timezone.utc)
+        self.jobs = [Job(entry, now) for entry in schedule]
+        self.started = now
+        self.running = {}
+        self.stopping = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._status_server = None
+
+    def status(self):
+        with self._lock:
+            running = sorted(self.running)
+        return {
+            'started': self.started.isoformat(),
+            'running': running,
+            'stopping': self.stopping.is_set(),
+            'jobs': [job.status() for job in sorted(self.jobs, key=lambda job: job.next_run)],
+            'http_retries': http_client.retry_policy.stats.summary(),
+            'youtube_quota': http_client.youtube_quota.summary(),
+        }
+
+    def serve_status(self, host=STATUS_HOST, port=STATUS_PORT):
+        daemon = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/status'):
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = json.dumps(daemon.status(), indent=2).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._status_server = ThreadingHTTPServer((host, port), StatusHandler)
+        self._status_server.daemon_threads = True
+        threading.Thread(target=self._status_server.serve_forever, name='status', daemon=True).start()
+        log_message(f"Status on http://{host}:{self._status_server.server_port}/status")
+
+    def stop(self, signum=None, frame=None):
+        if self.stopping.is_set():
+            # Second signal: give up on the running job too
+            raise KeyboardInterrupt
+        with self._lock:
+            running = ', '.join(sorted(self.running))
+        if running:
+            log_message(f"Shutdown requested - finishing {running} first")
+        self.stopping.set()
+        self._wake.set()
+
+    def _run_job(self, job, alone):
+        try:
+            result = job.run(alone)
+            log_message(f"{job.name}: {result} in {job.last['seconds']}s")
+        finally:
+            job.next_run = next_run(job.entry, max(datetime.now(timezone.utc), job.next_run))
+            job.warmed = False
+            log_message(f"{job.name}: next run {job.next_run.isoformat()}")
+
+            with self._lock:
+                del self.running[job.name]
+            self._wake.set()
+
+    def run(self):
+        """Run due jobs until stopped
+
+        Each due job gets its own thread, so channels scheduled at the same
+        time (or a create still running when a live update is due) do not
+        wait for each other; they share the HTTP sessions, the quota ledger
+        and the database lock. This thread only schedules and warms up, and
+        once stopped waits for the running jobs to finish.
+        """
+        for job in self.jobs:
+            log_message(f"{job.name}: next run {job.next_run.isoformat()}")
+
+        while not self.stopping.is_set():
+            now = datetime.now(timezone.utc)
+            with self._lock:
+                waiting = [job for job in self.jobs if job.name not in self.running]
+            if not waiting:
+                self._wait(None)
+                continue
+            job = min(waiting, key=lambda job: job.next_run)
+            until = (job.next_run - now).total_seconds()
+
+            if until > WARMUP or (until > 0 and job.warmed):
+                self._wait(until - WARMUP if until > WARMUP else until)
+                continue
+            if until > 0:
+                warm_up(job)
+                continue
+
+            log_separator()
+            log_message(f"Running {job.name} (scheduled {job.next_run.isoformat()})")
+            with self._lock:
+                alone = not self.running
+                thread = threading.Thread(target=self._run_job, args=(job, alone), name=job.name, daemon=True)
+                self.running[job.name] = thread
+            thread.start()
+
+        with self._lock:
+            threads = list(self.running.values())
+        for thread in threads:
+            thread.join()
+
+    def _wait(self, timeout):
+        """Sleep until timeout, a job finishing or a stop request, whichever comes first"""
+        self._wake.wait(timeout)
+        self._wake.clear()
+
+    def shutdown(self):
+        if self._status_server is not None:
+            self._status_server.shutdown()
+            self._status_server.server_close()
+        http_client.close_all()
+        log_message("Daemon stopped")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Planning Center publishing jobs on a schedule")
+    parser.add_argument('--schedule', default=SCHEDULE_FILE, help="JSON schedule table (default: from the channel table)")
+    parser.add_argument('--status-port', type=int, default=STATUS_PORT)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    log_separator()
+    log_message("=== Starting daemon ===")
+
+    daemon = Daemon(load_schedule(args.schedule))
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.serve_status(port=args.status_port)
+
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        log_message("Interrupted during a job")
+        sys.exit(130)
+    finally:
+        daemon.shutdown()
@@ -0,0 +1,51 @@
+"""
+Local database
+The one SQLite connection shared by the episode cache, the handoff store, the quota ledger and the
+YouTube catalogue; each registers its schema here and it is applied when the connection opens
+"""
+
+import sqlite3
+import threading
+
+from decouple import config
+
+CACHE_DB = config('CACHE_DB', default='pco_cache.sqlite3')
+
+# Held around every use of the connection - it is shared by all threads
+lock = threading.RLock()
+
+_schemas = []
+_connection = None
+
+
+def _apply(connection, schema, migrate):
+    connection.executescript(schema)
+    if migrate is not None:
+        migrate(connection)
+    connection.commit()
+
+
+def register(schema, migrate=None):
+    """Create the tables in schema (a script of CREATE ... IF NOT EXISTS statements) on first use
+
+    migrate, if given, is called with the connection after the script, to
+    bring tables written by an older version up to date.
+    """
+    with lock:
+        _schemas.append((schema, migrate))
+        if _connection is not None:
+            _apply(_connection, schema, migrate)
+
+
+def connect(path=None):
+    """Return the shared connection, opening it (and creating every registered schema) on first use"""
+    global _connection
+
+    with lock:
+        if _connection is None:
+            connection = sqlite3.connect(path or CACHE_DB, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            for schema, migrate in _schemas:
+                _apply(connection, schema, migrate)
+            _connection = connection
+        return _connection
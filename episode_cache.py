@@ -0,0 +1,250 @@
+"""
+Local episode cache
+SQLite copy of a channel's episodes and episode_times, kept current by incremental syncs
+"""
+
+import hashlib
+import time
+from datetime import date
+
+from decouple import config
+
+import database
+from episode_index import SUNDAY_CHANNEL_ID, episode_date, fetch_channel_pages
+
+# A cache synced within this many seconds is read without touching the API
+CACHE_MAX_AGE = config('CACHE_MAX_AGE', default=900, cast=int)
+
+# Incremental syncs cannot see deletions, so rebuild from scratch this often
+FULL_SYNC_INTERVAL = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    title TEXT,
+    service_date TEXT,
+    published_live_at TEXT,
+    published_to_library_at TEXT,
+    library_video_url TEXT,
+    description_hash TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS episodes_by_date ON episodes (channel_id, service_date);
+CREATE TABLE IF NOT EXISTS episode_times (
+    id TEXT PRIMARY KEY,
+    episode_id TEXT NOT NULL,
+    starts_at TEXT,
+    video_embed_code TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS episode_times_by_episode ON episode_times (episode_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    channel_id TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at REAL,
+    full_synced_at REAL
+);
+"""
+
+database.register(SCHEMA)
+
+
+def description_hash(description):
+    if description is None:
+        return None
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def record_episode(episode, channel_id=SUNDAY_CHANNEL_ID):
+    """Store (or refresh) a JSON:API episode resource"""
+    attributes = episode.get('attributes', {})
+    service_date = episode_date(episode)
+
+    with database.lock:
+        db = database.connect()
+        db.execute(
+            """INSERT INTO episodes (id, channel_id, title, service_date, published_live_at,
+                                     published_to_library_at, library_video_url, description_hash, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET
+                   channel_id = excluded.channel_id,
+                   title = excluded.title,
+                   service_date = excluded.service_date,
+                   published_live_at = excluded.published_live_at,
+                   published_to_library_at = excluded.published_to_library_at,
+                   library_video_url = excluded.library_video_url,
+                   description_hash = excluded.description_hash,
+                   updated_at = excluded.updated_at""",
+            (
+                episode['id'],
+                channel_id,
+                attributes.get('title'),
+                service_date.isoformat() if service_date else None,
+                attributes.get('published_live_at'),
+                attributes.get('published_to_library_at'),
+                attributes.get('library_video_url'),
+                description_hash(attributes.get('description')),
+                attributes.get('updated_at'),
+            )
+        )
+        db.commit()
+
+
+def record_episode_time(episode_time, episode_id):
+    """Store (or refresh) a JSON:API episode_time resource"""
+    attributes = episode_time.get('attributes', {})
+
+    with database.lock:
+        db = database.connect()
+        db.execute(
+            """INSERT INTO episode_times (id, episode_id, starts_at, video_embed_code, updated_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET
+                   episode_id = excluded.episode_id,
+                   starts_at = excluded.starts_at,
+                   video_embed_code = excluded.video_embed_code,
+                   updated_at = excluded.updated_at""",
+            (
+                episode_time['id'],
+                episode_id,
+                attributes.get('starts_at'),
+                attributes.get('video_embed_code'),
+                attributes.get('updated_at'),
+            )
+        )
+        db.commit()
+
+
+def _sync_state(channel_id):
+    row = database.connect().execute(
+        "SELECT watermark, synced_at, full_synced_at FROM sync_state WHERE channel_id = ?",
+        (channel_id,)
+    ).fetchone()
+    return row
+
+
+def is_fresh(channel_id=SUNDAY_CHANNEL_ID, max_age=None):
+    """True when the channel was synced recently enough to skip the API"""
+    max_age = CACHE_MAX_AGE if max_age is None else max_age
+    with database.lock:
+        state = _sync_state(channel_id)
+    return state is not None and state['synced_at'] is not None and time.time() - state['synced_at'] < max_age
+
+
+def sync(channel_id=SUNDAY_CHANNEL_ID, full=False):
+    """Pull episodes changed since the last sync watermark into the cache
+
+    Episodes are listed newest-updated first with their episode_times included,
+    and paging stops at the first record that is not newer than the watermark.
+    Returns the number of episodes written.
+    """
+    with database.lock:
+        state = _sync_state(channel_id)
+
+    now = time.time()
+    if state is None or state['full_synced_at'] is None or now - state['full_synced_at'] > FULL_SYNC_INTERVAL:
+        full = True
+
+    watermark = None if full else state['watermark']
+    newest = watermark
+    written = 0
+
+    if full:
+        with database.lock:
+            db = database.connect()
+            db.execute(
+                "DELETE FROM episode_times WHERE episode_id IN (SELECT id FROM episodes WHERE channel_id = ?)",
+                (channel_id,)
+            )
+            db.execute("DELETE FROM episodes WHERE channel_id = ?", (channel_id,))
+            db.commit()
+
+    params = {'order': '-updated_at', 'include': 'episode_times'}
+    done = False
+
+    for page in fetch_channel_pages(channel_id, params):
+        times_by_id = {
+            item['id']: item for item in page.get('included', [])
+            if item.get('type') == 'EpisodeTime'
+        }
+
+        for episode in page.get('data', []):
+            updated_at = episode.get('attributes', {}).get('updated_at')
+            if watermark and updated_at and updated_at <= watermark:
+                done = True
+                break
+
+            record_episode(episode, channel_id)
+            written += 1
+
+            related = episode.get('relationships', {}).get('episode_times', {}).get('data') or []
+            for ref in related:
+                if ref.get('id') in times_by_id:
+                    record_episode_time(times_by_id[ref['id']], episode['id'])
+
+            if updated_at and (newest is None or updated_at > newest):
+                newest = updated_at
+
+        if done:
+            break
+
+    with database.lock:
+        db = database.connect()
+        db.execute(
+            """INSERT INTO sync_state (channel_id, watermark, synced_at, full_synced_at)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(channel_id) DO UPDATE SET
+                   watermark = excluded.watermark,
+                   synced_at = excluded.synced_at,
+                   full_synced_at = COALESCE(excluded.full_synced_at, sync_state.full_synced_at)""",
+            (channel_id, newest, now, now if full else None)
+        )
+        db.commit()
+
+    return written
+
+
+def load_index(channel_id=SUNDAY_CHANNEL_ID, max_age=None):
+    """Return a {service date: episode} map read from the cache
+
+    Same shape as episode_index.build_episode_index. The cache is synced
+    incrementally first unless it is still fresh.
+    """
+    if not is_fresh(channel_id, max_age):
+        sync(channel_id)
+
+    with database.lock:
+        rows = database.connect().execute(
+            """SELECT * FROM episodes WHERE channel_id = ? AND service_date IS NOT NULL
+               ORDER BY published_live_at DESC""",
+            (channel_id,)
+        ).fetchall()
+
+    index = {}
+    for row in rows:
+        service_date = date.fromisoformat(row['service_date'])
+        if service_date in index:
+            continue
+        index[service_date] = {
+            'episode_id': row['id'],
+            'title': row['title'],
+            'attributes': {
+                'title': row['title'],
+                'published_live_at': row['published_live_at'],
+                'published_to_library_at': row['published_to_library_at'],
+                'library_video_url': row['library_video_url'],
+            },
+        }
+
+    return index
+
+
+def episode_time_ids(episode_id):
+    """Cached episode_time ids for an episode, oldest first"""
+    with database.lock:
+        rows = database.connect().execute(
+            "SELECT id FROM episode_times WHERE episode_id = ? ORDER BY starts_at, id",
+            (episode_id,)
+        ).fetchall()
+    return [row['id'] for row in rows]
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Episode creation engine
+Creates each configured channel's next service episode (or every missing one some weeks ahead) -
+the episode, its episode_time embed and its library publication - concurrently in one process
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import http_client
+from http_client import PCO_API
+import channels
+import episode_cache
+import state_store
+import live_broadcast
+from episode_index import included_episode_times
+from write_coalescer import WriteCoalescer
+import run_log
+import tracing
+import metrics
+from run_log import RunLogger
+
+# Channels created at once - one PCO request each in flight, well inside the pool and rate limit
+MAX_WORKERS = 5
+
+LOG_FILE = "episodes.log"
+
+# Seconds a run waits for another run creating the same episode to finish, and how often it checks
+CLAIM_WAIT = 60
+CLAIM_POLL = 1
+
+
+# Lines are written by a background thread and flushed at exit (see run_log.py)
+_log = RunLogger(LOG_FILE)
+log_message = _log.log_message
+log_separator = _log.log_separator
+
+
+def next_service_date(channel, today=None):
+    """The channel's first service day on or after today"""
+    today = today or datetime.now().date()
+    return today + timedelta(days=(channels.WEEKDAYS.index(channel['weekday']) - today.weekday()) % 7)
+
+
+def starts_at(channel, service_date, pco=False):
+    """Service start as written to PCO: ...Z for episode_times, +00:00 for episode attributes"""
+    suffix = '+00:00' if pco else 'Z'
+    return f"{service_date:%Y-%m-%d}T{channel['starts_at']}:00{suffix}"
+
+
+def episode_title(channel, service_date):
+    return channel['title'].format(date=service_date)
+
+
+def existing_episode(channel_id, service_date, index=None):
+    """Ids of the channel's episode for service_date if it already exists, else None
+
+    The local key store answers first (free); otherwise the channel index is
+    consulted - synced incrementally unless one is passed in - and a hit is
+    written back to the key store. Result is {'episode_id', 'episode_time_id',
+    'complete'}; episode_time_id may be None when the cache has not seen it.
+    complete is True once this tool has written the episode's embed and
+    library publication; an episode found only in the index is not complete.
+    """
+    known = state_store.load_episode(channel_id, service_date)
+    if known:
+        return known
+
+    if index is None:
+        index = episode_cache.load_index(channel_id, max_age=0)
+    episode = index.get(service_date)
+    if episode is None:
+        return None
+
+    time_ids = episode_cache.episode_time_ids(episode['episode_id'])
+    known = {'episode_id': episode['episode_id'], 'episode_time_id': time_ids[0] if time_ids else None,
+             'complete': False}
+    state_store.save_episode(channel_id, service_date, known['episode_id'], known['episode_time_id'])
+    return known
+
+
+def create_episode(channel, service_date, log=print, api_key=None, resolve_broadcast=True, index=None, video=None):
+    """Create one service episode unless it already exists; returns its ids, or None on failure
+
+    The result is {'channel', 'service_date', 'episode_id', 'episode_time_id',
+    'video_id', 'created'}. created is False when the episode was already
+    there (see existing_episode) - nothing is written then, so reruns are free.
+    An existing episode that is not complete (a PATCH failed when it was
+    created) gets whichever embed and library attributes it is still missing.
+    A run that finds another run creating the same episode waits for it (up to
+    CLAIM_WAIT seconds) and returns that episode instead of a second one.
+    video_id is set when a live channel's broadcast was already scheduled and
+    the episode points at it from the start. Pass resolve_broadcast=False to
+    skip that lookup (a 100-unit search), e.g. for services weeks away whose
+    broadcast cannot be scheduled yet, or pass the service's video
+    ({'video_id'} and optionally 'description') when it is already known.
+    """
+    with run_log.context(step='create_episode', channel=channel['name'], service_date=service_date.isoformat()):
+        return _guarded_create(channel, service_date, log, api_key, resolve_broadcast, index, video)
+
+
+def _already_exists(channel, service_date, title, existing, log):
+    run_log.add_context(episode_id=existing['episode_id'])
+    log(f"Episode for {title} already exists: {existing['episode_id']} - not creating another")
+    return dict(existing, channel=channel['name'], service_date=service_date, video_id=None, created=False)
+
+
+def _wait_for_claim(channel_id, service_date, title, log):
+    """Claim the episode, waiting up to CLAIM_WAIT seconds for another run's claim; False on timeout"""
+    deadline = time.monotonic() + CLAIM_WAIT
+    if state_store.claim_episode(channel_id, service_date):
+        return True
+
+    log(f"Another run is creating the episode for {title} - waiting for it to finish")
+    while time.monotonic() < deadline:
+        time.sleep(CLAIM_POLL)
+        if state_store.claim_episode(channel_id, service_date):
+            return True
+
+    log(f"ERROR: Another run was still creating the episode for {title} after {CLAIM_WAIT}s")
+    return False
+
+
+def _guarded_create(channel, service_date, log, api_key, resolve_broadcast, index, video):
+    title = episode_title(channel, service_date)
+    channel_id = channel['pco_channel_id']
+
+    existing = existing_episode(channel_id, service_date, index)
+    if existing and existing['complete']:
+        return _already_exists(channel, service_date, title, existing, log)
+
+    # Two runs racing past the check above: only the one holding the claim writes
+    if not _wait_for_claim(channel_id, service_date, title, log):
+        return None
+
+    try:
+        # The other run may have finished the episode between the check above and the claim
+        existing = state_store.load_episode(channel_id, service_date)
+        if existing and existing['complete']:
+            return _already_exists(channel, service_date, title, existing, log)
+        if existing:
+            return _complete_episode(channel, service_date, title, existing, log, api_key, resolve_broadcast, video)
+        return _create_new_episode(channel, service_date, title, log, api_key, resolve_broadcast, video)
+    finally:
+        state_store.release_claim(channel_id, service_date)
+
+
+def _service_video(channel, service_date, log, api_key, resolve_broadcast, video):
+    """The video the episode should point at: the one passed in, else a live channel's scheduled broadcast"""
+    if video:
+        return video
+
+    api_key = api_key or os.environ.get('YTKEY')
+    if not (channel['live'] and api_key and resolve_broadcast):
+        return None
+
+    try:
+        with tracing.span('broadcast_lookup'):
+            broadcast = live_broadcast.pre_resolve(api_key, service_date, channel['youtube_channel_id'])
+    except Exception as e:
+        log(f"WARNING: Could not look up the scheduled broadcast: {e}")
+        return None
+
+    if broadcast:
+        log(f"Scheduled broadcast: {broadcast['video_id']} at {broadcast['scheduled_start_time']}")
+    return broadcast
+
+
+def _publication_writes(channel, service_date, episode_id, episode_time_id, video):
+    """(span, description, url, attributes) for the episode_time embed and the library publication
+
+    They are different resources, so each is its own PATCH.
+    """
+    embed = channels.VIDEO_EMBED.format(video_id=video['video_id']) if video else channel['embed']
+    library = {'published_to_library_at': starts_at(channel, service_date, pco=True)}
+    if video:
+        library['library_video_url'] = 'https://www.youtube.com/watch?v=' + video['video_id']
+        if video.get('description'):
+            library['description'] = video['description']
+
+    return [
+        ('embed_patch', 'iframe', f"{PCO_API}/episodes/{episode_id}/episode_times/{episode_time_id}",
+         {'starts_at': starts_at(channel, service_date), 'video_embed_code': embed}),
+        ('library_patch', 'library publication', f"{PCO_API}/episodes/{episode_id}/", library),
+    ]
+
+
+def _send_publication(writes, log):
+    """Send the writes from _publication_writes; True when every attribute was written"""
+    complete = True
+    for step, what, url, attributes in writes:
+        coalescer = WriteCoalescer()
+        coalescer.stage(url, **attributes)
+        with tracing.span(step):
+            results = coalescer.flush()
+
+        for result in results:
+            if not result['failed']:
+                log(f"✓ Episode {what} updated successfully (HTTP {result['response'].status_code})")
+            else:
+                complete = False
+                for name, error in result['failed'].items():
+                    log(f"WARNING: Episode {what} patch of {name} failed - {error}")
+    return complete
+
+
+def _create_new_episode(channel, service_date, title, log, api_key, resolve_broadcast, video):
+    channel_id = channel['pco_channel_id']
+    log(f"Creating episode for: {title}")
+
+    payload = {
+        "data": {
+            "attributes": {
+                "published_to_library_at": starts_at(channel, service_date),
+                "title": title
+            }
+        }
+    }
+
+    log("\nCreating new episode in Planning Center...")
+    # include=episode_times returns the new episode_time with the episode - no second lookup
+    with tracing.span('create'):
+        res = http_client.post(
+            f"{PCO_API}/channels/{channel_id}/episodes",
+            params={'include': 'episode_times'},
+            json=payload
+        )
+
+    if res.status_code not in [200, 201]:
+        log(f"ERROR: Failed to create episode. HTTP {res.status_code}")
+        log(f"Response: {res.text}")
+        return None
+    log(f"✓ Episode created successfully (HTTP {res.status_code})")
+
+    res_json = res.json()
+    if 'data' not in res_json or 'id' not in res_json['data']:
+        log("ERROR: Invalid response from episode creation")
+        log(f"Response: {res.text}")
+        return None
+
+    episode_id = res_json['data']['id']
+    run_log.add_context(episode_id=episode_id)
+    episode_cache.record_episode(res_json['data'], channel_id)
+    log(f"Episode ID: {episode_id}")
+
+    # If the service's broadcast is already scheduled, point the episode at it now;
+    # updateyoutube.py then only has to confirm it went live
+    video = _service_video(channel, service_date, log, api_key, resolve_broadcast, video)
+
+    episode_times = included_episode_times(res_json)
+
+    if not episode_times:
+        log("\nGetting episode time ID...")
+        with tracing.span('episode_times_lookup'):
+            getepres = http_client.get(f"{PCO_API}/episodes/{episode_id}/episode_times")
+
+        if getepres.status_code != 200:
+            log(f"ERROR: Failed to get episode times. HTTP {getepres.status_code}")
+            log(f"Response: {getepres.text}")
+            return None
+
+        episode_times = getepres.json().get('data', [])
+
+    if len(episode_times) == 0:
+        log("ERROR: No episode times found")
+        return None
+
+    episode_time_id = episode_times[0]['id']
+    episode_cache.record_episode_time(episode_times[0], episode_id)
+    log(f"Episode time ID: {episode_time_id}")
+
+    # Hand the ids to updateyoutube.py so the live update needs no lookups. The
+    # episode is only marked complete once both PATCHes went through; until
+    # then the next run finishes it instead of skipping it.
+    state_store.save_episode(channel_id, service_date, episode_id, episode_time_id)
+
+    log("\nUpdating episode embed and publishing to library...")
+    writes = _publication_writes(channel, service_date, episode_id, episode_time_id, video)
+    if _send_publication(writes, log):
+        state_store.mark_complete(channel_id, service_date)
+
+    return {
+        'channel': channel['name'],
+        'service_date': service_date,
+        'episode_id': episode_id,
+        'episode_time_id': episode_time_id,
+        'video_id': video['video_id'] if video else None,
+        'created': True,
+    }
+
+
+def _complete_episode(channel, service_date, title, existing, log, api_key, resolve_broadcast, video):
+    """Write whichever embed and library attributes an existing, incomplete episode is missing
+
+    Attributes already set are left alone - the live update may have replaced
+    the embed since the episode was created.
+    """
+    channel_id = channel['pco_channel_id']
+    episode_id = existing['episode_id']
+    run_log.add_context(episode_id=episode_id)
+    log(f"Episode for {title} already exists: {episode_id} - checking its embed and library publication")
+
+    with tracing.span('episode_lookup'):
+        res = http_client.get(f"{PCO_API}/episodes/{episode_id}", params={'include': 'episode_times'})
+
+    if res.status_code != 200:
+        log(f"ERROR: Failed to get episode {episode_id}. HTTP {res.status_code}")
+        log(f"Response: {res.text}")
+        return None
+
+    res_json = res.json()
+    episode_times = included_episode_times(res_json)
+    if len(episode_times) == 0:
+        log("ERROR: No episode times found")
+        return None
+
+    episode_time = episode_times[0]
+    episode_cache.record_episode(res_json['data'], channel_id)
+    episode_cache.record_episode_time(episode_time, episode_id)
+    state_store.save_episode(channel_id, service_date, episode_id, episode_time['id'])
+    current = {'embed_patch': episode_time['attributes'], 'library_patch': res_json['data']['attributes']}
+
+    def missing(video):
+        writes = _publication_writes(channel, service_date, episode_id, episode_time['id'], video)
+        writes = [(step, what, url, {name: value for name, value in attributes.items()
+                                     if not current[step].get(name)})
+                  for step, what, url, attributes in writes]
+        return [write for write in writes if write[3]]
+
+    # The broadcast lookup can cost quota - only make it when something is missing
+    writes = missing(video)
+    if writes:
+        video = _service_video(channel, service_date, log, api_key, resolve_broadcast, video)
+        writes = missing(video)
+
+    if writes:
+        log("\nWriting the episode's missing embed and library attributes...")
+    if _send_publication(writes, log):
+        state_store.mark_complete(channel_id, service_date)
+
+    return {
+        'channel': channel['name'],
+        'service_date': service_date,
+        'episode_id': episode_id,
+        'episode_time_id': episode_time['id'],
+        'video_id': video['video_id'] if video and writes else None,
+        'created': False,
+    }
+
+
+def _create_logged(channel, service_date, log, **kwargs):
+    def channel_log(message):
+        log(f"[{channel['name']}] {message.lstrip()}")
+
+    try:
+        return create_episode(channel, service_date, log=channel_log, **kwargs)
+    except Exception as e:
+        channel_log(f"ERROR: Exception creating episode: {e}")
+        return None
+
+
+def _selected_channels(selected):
+    return [channel for channel in channels.all_channels() if not selected or channel['name'] in selected]
+
+
+def create_all(selected=None, today=None, log=print):
+    """Create the next service episode for every channel (or the named ones) concurrently
+
+    Returns {channel name: create_episode result or None}.
+    """
+    targets = _selected_channels(selected)
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(targets) or 1)) as pool:
+        futures = {
+            channel['name']: pool.submit(_create_logged, channel, next_service_date(channel, today), log)
+            for channel in targets
+        }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def service_slots(channel, weeks, today=None):
+    """The channel's service dates over the next `weeks` weeks, starting with the next one"""
+    first = next_service_date(channel, today)
+    return [first + timedelta(weeks=week) for week in range(weeks)]
+
+
+def schedule_ahead(weeks, selected=None, today=None, log=print):
+    """Create every missing episode for the next `weeks` service slots of each channel
+
+    Each channel is checked against one incremental listing (the episode
+    cache, synced regardless of age); only the slots missing from it are
+    created, all concurrently. Running it again creates nothing.
+    Returns {(channel name, service date): create_episode result or None}.
+    """
+    today = today or datetime.now().date()
+    missing = []
+
+    for channel in _selected_channels(selected):
+        index = episode_cache.load_index(channel['pco_channel_id'], max_age=0)
+        slots = service_slots(channel, weeks, today)
+        wanted = [service_date for service_date in slots if service_date not in index]
+        log(f"[{channel['name']}] {len(slots) - len(wanted)} of {len(slots)} services already have episodes")
+        missing.extend((channel, service_date, index) for service_date in wanted)
+
+    if not missing:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(missing))) as pool:
+        futures = {
+            # Only today's broadcast can already be scheduled - skip the search for later weeks
+            (channel['name'], service_date): pool.submit(
+                _create_logged, channel, service_date, log, resolve_broadcast=service_date == today, index=index
+            )
+            for channel, service_date, index in missing
+        }
+    return {key: future.result() for key, future in futures.items()}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create service episodes for the configured channels")
+    parser.add_argument('command', nargs='?', choices=['next', 'schedule-ahead'], default='next',
+                        help="next: each channel's next service (default); schedule-ahead: every missing service for --weeks")
+    parser.add_argument('--weeks', type=int, default=4, metavar='N',
+                        help="services per channel to cover with schedule-ahead (default 4)")
+    parser.add_argument('--channel', action='append', metavar='NAME',
+                        help="only this channel (repeatable; default: every configured channel)")
+    args = parser.parse_args(argv)
+    if args.weeks < 1:
+        parser.error("--weeks must be at least 1")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    log_separator()
+    log_message("=== Starting episode_engine.py ===")
+
+    try:
+        if args.command == 'schedule-ahead':
+            results = schedule_ahead(args.weeks, args.channel, log=log_message)
+        else:
+            results = create_all(args.channel, log=log_message)
+    finally:
+        log_message(f"HTTP retries: {http_client.retry_policy.stats.summary()}")
+        log_message(f"YouTube quota: {http_client.youtube_quota.summary()}")
+        log_message(tracing.report())
+
+    failed = [name if isinstance(name, str) else f"{name[0]} {name[1]}"
+              for name, result in results.items() if result is None]
+    created = sum(1 for result in results.values() if result and result['created'])
+    metrics.write('episode_engine', not failed)
+    log_message(f"\nCreated {created} episodes, {len(results) - created - len(failed)} already existed"
+                + (f", failed: {', '.join(failed)}" if failed else ""))
+    sys.exit(1 if failed else 0)
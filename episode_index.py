@@ -0,0 +1,122 @@
+"""
+Channel episode index
+Pages through a Planning Center Publishing channel once and maps each service date to its episode
+"""
+
+import difflib
+import re
+from datetime import datetime
+
+import http_client
+from http_client import PCO_API
+
+SUNDAY_CHANNEL_ID = '3708'
+
+# Largest page size the Publishing API accepts
+PAGE_SIZE = 100
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december']
+
+# "<Weekday>, <Month> <day>, <year>" - loose enough to survive a missing comma or a typo
+TITLE_DATE_RE = re.compile(r'([A-Za-z]+)\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})')
+
+
+def parse_title_date(title):
+    """Return the service date written in an episode title, or None
+
+    Month names are matched fuzzily so "Octber 12, 2025" and "Sept 7, 2025" still resolve.
+    """
+    if not title:
+        return None
+
+    for word, day, year in TITLE_DATE_RE.findall(title):
+        word = word.lower()
+        # Abbreviations ("Sept") first, then near misses ("Octber")
+        match = [month for month in MONTHS if len(word) >= 3 and month.startswith(word)]
+        match = match or difflib.get_close_matches(word, MONTHS, n=1, cutoff=0.7)
+        if not match:
+            continue
+        try:
+            return datetime(int(year), MONTHS.index(match[0]) + 1, int(day)).date()
+        except ValueError:
+            continue
+
+    return None
+
+
+def episode_date(episode):
+    """Service date of a JSON:API episode resource (title first, then publish timestamps)"""
+    attributes = episode.get('attributes', {})
+
+    service_date = parse_title_date(attributes.get('title'))
+    if service_date:
+        return service_date
+
+    for field in ('published_live_at', 'published_to_library_at'):
+        value = attributes.get(field)
+        if value:
+            return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+    return None
+
+
+def fetch_channel_pages(channel_id=SUNDAY_CHANNEL_ID, params=None):
+    """Yield each JSON:API page of the channel's episodes, following links.next"""
+    url = f'{PCO_API}/channels/{channel_id}/episodes'
+    query = {'per_page': PAGE_SIZE, 'order': '-published_live_at'}
+    query.update(params or {})
+
+    while url:
+        response = http_client.get(url, params=query)
+
+        if response.status_code != 200:
+            raise Exception(f"Failed to list episodes for channel {channel_id}: HTTP {response.status_code}")
+
+        data = response.json()
+        yield data
+
+        # links.next already carries the paging, ordering and include parameters
+        url = data.get('links', {}).get('next')
+        query = None
+
+
+def fetch_channel_episodes(channel_id=SUNDAY_CHANNEL_ID, params=None):
+    """Yield every episode in the channel, page by page"""
+    for page in fetch_channel_pages(channel_id, params):
+        for episode in page.get('data', []):
+            yield episode
+
+
+def build_episode_index(channel_id=SUNDAY_CHANNEL_ID, wanted_dates=None):
+    """Return a {service date: episode} map for the channel
+
+    Each value is a dict with episode_id, title and the raw attributes. When
+    wanted_dates is given, paging stops as soon as all of them have been seen.
+    Where a date has more than one episode the most recently published wins.
+    """
+    index = {}
+    remaining = set(wanted_dates) if wanted_dates else None
+
+    for episode in fetch_channel_episodes(channel_id):
+        service_date = episode_date(episode)
+        if service_date is None or service_date in index:
+            continue
+
+        index[service_date] = {
+            'episode_id': episode['id'],
+            'title': episode.get('attributes', {}).get('title'),
+            'attributes': episode.get('attributes', {}),
+        }
+
+        if remaining is not None:
+            remaining.discard(service_date)
+            if not remaining:
+                break
+
+    return index
+
+
+def included_episode_times(document):
+    """EpisodeTime resources from a JSON:API document fetched with include=episode_times"""
+    return [item for item in document.get('included', []) if item.get('type') == 'EpisodeTime']
@@ -0,0 +1,95 @@
+"""
+Health-check pings
+Run lifecycle signals for the healthchecks.io monitor (start, fail with the error, success with the
+exit code), sent from a background thread so a slow monitor never delays the run
+"""
+
+import atexit
+import queue
+import threading
+
+import requests
+from decouple import config
+
+# Point at healthcheck_stub.py (e.g. http://127.0.0.1:8091) to watch the pings locally
+HEALTHCHECK_BASE = config('HEALTHCHECK_BASE', default='https://hc-ping.com').rstrip('/')
+
+# Seconds a ping may take; also how long exit waits for pings still queued
+PING_TIMEOUT = config('HEALTHCHECK_TIMEOUT', default=5, cast=float)
+
+# The monitor keeps the first 100 kB of a ping body; error summaries stay well under
+MAX_BODY = 10000
+
+# One sender thread for every monitor in the process, so pings leave in the order they were made
+_queue = queue.Queue()
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def url(check_id):
+    return f"{HEALTHCHECK_BASE}/{check_id}" if check_id else None
+
+
+def channel_url(channel, run):
+    """Ping URL of a channel's 'create' or 'live' check (see channels.py), or None when it has none"""
+    return url(channel['healthchecks'].get(run))
+
+
+def _send_loop():
+    session = requests.Session()
+    while True:
+        monitor, signal, body = _queue.get()
+        try:
+            response = session.post(f"{monitor.url}/{signal}", data=body.encode(), timeout=monitor.timeout)
+            monitor.sent.append((signal, response.status_code))
+        except requests.RequestException as e:
+            monitor.sent.append((signal, type(e).__name__))
+        finally:
+            _queue.task_done()
+
+
+class Monitor:
+    """Pings for one check: start() lets the monitor time the run, success() or fail() closes it
+
+    Calls only queue the ping and return at once. A ping that fails or times
+    out is dropped - monitoring never fails the run. A monitor without a URL
+    sends nothing.
+    """
+
+    def __init__(self, check_url, timeout=PING_TIMEOUT):
+        self.url = check_url
+        self.timeout = timeout
+        self.sent = []
+
+    def start(self):
+        self._ping('start')
+
+    def success(self, exit_code=0, summary=''):
+        self._ping(str(exit_code), summary)
+
+    def fail(self, summary=''):
+        self._ping('fail', summary)
+
+    def _ping(self, signal, body=''):
+        global _sender
+
+        if not self.url:
+            return
+        with _sender_lock:
+            if _sender is None:
+                _sender = threading.Thread(target=_send_loop, name='healthcheck', daemon=True)
+                _sender.start()
+        _queue.put((self, signal, body[:MAX_BODY]))
+
+
+def wait(timeout=PING_TIMEOUT):
+    """Wait up to timeout seconds for queued pings to go out; True if they all did"""
+    if _sender is None:
+        return True
+    done = threading.Event()
+    threading.Thread(target=lambda: (_queue.join(), done.set()), daemon=True).start()
+    return done.wait(timeout)
+
+
+# Give pings made just before exit (the success or fail ping) a bounded chance to leave
+atexit.register(wait)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the healthchecks.io ping endpoint
+Prints every start, fail and exit-code ping (with its body and the run time since start) and can
+answer slowly, to check that a slow monitor does not hold up the scripts
+
+    python healthcheck_stub.py --port 8091 --delay 10
+    HEALTHCHECK_BASE=http://127.0.0.1:8091 python main.py
+"""
+
+import argparse
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def log(message):
+    print(f"[healthcheck] {message}", flush=True)
+
+
+def make_handler(delay):
+    started = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _ping(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode(errors='replace') if length else ''
+            check, _, signal = self.path.strip('/').partition('/')
+            signal = signal or 'success'
+
+            if signal == 'start':
+                started[check] = time.monotonic()
+                log(f"{check} start")
+            else:
+                took = f" after {time.monotonic() - started.pop(check):.1f}s" if check in started else ""
+                log(f"{check} {signal}{took}" + (f": {body}" if body else ""))
+
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.end_headers()
+            self.wfile.write(b"OK")
+
+        do_GET = _ping
+        do_POST = _ping
+        do_HEAD = _ping
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print health-check pings sent by the scripts")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8091)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to wait before answering each ping")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.delay))
+    log(f"listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
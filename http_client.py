@@ -0,0 +1,235 @@
+"""
+Shared HTTP client for Planning Center and YouTube API calls
+Keeps one keep-alive session per host so repeated calls reuse the same TCP/TLS connection
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from decouple import config
+
+from quota_ledger import QuotaLedger
+from rate_limiter import RateLimiter
+from retry_policy import RETRY_METHODS, RETRYABLE_STATUS, CircuitBreaker, RetryPolicy
+import tracing
+import metrics
+import run_log
+
+# Base URLs; point both at mock_api.py (e.g. PCO_API_BASE=http://127.0.0.1:8093/publishing/v2,
+# YOUTUBE_API_BASE=http://127.0.0.1:8094/youtube/v3) to run offline
+PCO_API = config('PCO_API_BASE', default='https://api.planningcenteronline.com/publishing/v2').rstrip('/')
+YOUTUBE_API = config('YOUTUBE_API_BASE', default='https://www.googleapis.com/youtube/v3').rstrip('/')
+
+# Default (connect, read) timeout in seconds applied when a call does not pass its own
+DEFAULT_TIMEOUT = (5, 30)
+
+# Connections kept open per host - sized for the concurrent backfill
+POOL_SIZE = 10
+
+# Times a throttled (429) request is re-sent after waiting out Retry-After
+MAX_THROTTLE_RETRIES = 3
+
+# Shared by every Planning Center call in the process
+pco_rate_limiter = RateLimiter()
+
+# Shared by every session; retry_policy.stats feeds the run summaries
+retry_policy = RetryPolicy()
+
+# Every YouTube call is charged here; scripts set youtube_quota.priority for their work
+youtube_quota = QuotaLedger()
+
+
+def _quota_metrics():
+    for name, units in youtube_quota.spent.items():
+        metrics.gauge('youtube_quota_units', units, endpoint=name)
+
+
+metrics.add_collector(_quota_metrics)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default timeout to every request
+
+    Connection errors and 5xx responses are retried with backoff for idempotent
+    methods (pass retry=True/False to override), and a circuit breaker stops
+    requests to the host after repeated failures. When a rate limiter is
+    attached, every request waits for a token first, every response is fed
+    back to it, and 429 responses are re-sent once the limiter's Retry-After
+    block has passed. When a quota ledger is attached, every attempt is checked
+    against its budget before sending and charged once a response arrives.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, rate_limiter=None, circuit_breaker=None, quota=None):
+        super().__init__()
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.quota = quota
+
+    def request(self, method, url, retry=None, **kwargs):
+        """Send the request (with retries) inside an 'http' tracing span, counted in the run metrics
+
+        The outcome also becomes the http_status and latency_ms of this thread's
+        log lines (see run_log.record_http), so the lines about the response carry them.
+        """
+        parts = urlsplit(url)
+        method = method.upper()
+        status = 'error'
+        started = time.perf_counter()
+
+        try:
+            with tracing.span(f"{method} {parts.netloc}", kind='http', path=parts.path, retries=0) as trace:
+                response = self._send(method, url, retry, trace, **kwargs)
+                status = response.status_code
+                trace.set(http_status=status, bytes=len(response.content))
+                if status >= 400:
+                    trace.status = 'error'
+                return response
+        finally:
+            elapsed = time.perf_counter() - started
+            run_log.record_http(status if isinstance(status, int) else None, round(elapsed * 1000, 1))
+            metrics.count('api_requests', host=parts.netloc, method=method, status=status)
+            metrics.count('api_request_seconds', elapsed, host=parts.netloc, method=method)
+            if trace.attributes['retries']:
+                metrics.count('api_retries', trace.attributes['retries'], host=parts.netloc)
+
+    def _send(self, method, url, retry, trace, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        if retry is None:
+            retry = method.upper() in RETRY_METHODS
+
+        attempt = 0
+        throttled = 0
+
+        # Only Data API calls are metered - not other requests to the same host
+        metered = self.quota is not None and url.startswith(YOUTUBE_API)
+
+        while True:
+            if metered:
+                self.quota.check(url)
+            response, error = self._attempt(method, url, **kwargs)
+
+            if error is not None:
+                if not retry or not retry_policy.can_retry(attempt):
+                    raise error
+                retry_policy.backoff(attempt)
+                attempt += 1
+                trace.set(retries=attempt + throttled)
+                continue
+
+            if metered:
+                self.quota.charge(url, response)
+            if self.rate_limiter is not None:
+                self.rate_limiter.update(response)
+                if response.status_code == 429 and throttled < MAX_THROTTLE_RETRIES:
+                    throttled += 1
+                    trace.set(retries=attempt + throttled)
+                    continue
+
+            if response.status_code in RETRYABLE_STATUS and retry and retry_policy.can_retry(attempt):
+                retry_policy.backoff(attempt)
+                attempt += 1
+                trace.set(retries=attempt + throttled)
+                continue
+
+            return response
+
+    def _attempt(self, method, url, **kwargs):
+        """Send once and settle the circuit breaker for this attempt
+
+        Returns (response, None), or (None, error) after a connection error
+        or timeout. The breaker's outcome is recorded before
+        returning: 5xx and connection failures count against the host, any
+        other response - a 429 included, since the host answered - for it.
+        An attempt that ends any other way releases a half-open trial, so
+        the breaker can never stay stuck waiting on it.
+        """
+        breaker = self.circuit_breaker
+        if breaker is not None:
+            breaker.before_request()
+
+        settled = False
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response, error = super().request(method, url, **kwargs), None
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                response, error = None, e
+
+            if breaker is not None:
+                if error is not None or response.status_code in RETRYABLE_STATUS:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            settled = True
+            return response, error
+        finally:
+            if breaker is not None and not settled:
+                breaker.abandon_trial()
+
+
+def _build_session(netloc):
+    session = TimeoutSession(circuit_breaker=CircuitBreaker(netloc))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    if netloc == urlsplit(PCO_API).netloc:
+        session.auth = HTTPBasicAuth(config('App_ID'), config('Secret'))
+        session.rate_limiter = pco_rate_limiter
+    elif netloc == urlsplit(YOUTUBE_API).netloc:
+        session.quota = youtube_quota
+
+    return session
+
+
+def session_for(url):
+    """Return the shared session for the host (and port) of the given URL"""
+    netloc = urlsplit(url).netloc
+
+    with _sessions_lock:
+        session = _sessions.get(netloc)
+        if session is None:
+            session = _build_session(netloc)
+            _sessions[netloc] = session
+
+    return session
+
+
+def get(url, **kwargs):
+    return session_for(url).get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return session_for(url).post(url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return session_for(url).patch(url, **kwargs)
+
+
+def warm(url):
+    """Open (or refresh) the pooled connection to url's host ahead of a job; failures are ignored"""
+    parts = urlsplit(url)
+    try:
+        session_for(url).head(f"{parts.scheme}://{parts.netloc}/", retry=False, timeout=DEFAULT_TIMEOUT[0])
+        return True
+    except requests.exceptions.RequestException:
+        return False
+
+
+def close_all():
+    """Close every pooled session (used on shutdown)"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,161 @@
+"""
+Live broadcast pre-resolution
+Finds the channel's scheduled broadcast ahead of the service with one eventType=upcoming search,
+then confirms it has gone live with cheap videos.list liveStreamingDetails calls on that id
+"""
+
+import time
+from datetime import datetime, timezone
+
+import http_client
+import metrics
+from http_client import YOUTUBE_API
+import state_store
+import video_details
+from youtube_catalogue import YOUTUBE_CHANNEL_ID
+
+# Seconds between liveStreamingDetails checks once the scheduled start has passed
+POLL_INTERVAL = 10
+
+# Longest single wait while the broadcast is still well ahead of its scheduled start
+MAX_POLL_INTERVAL = 60
+
+
+def parse_time(value):
+    """Aware datetime from a YouTube RFC 3339 timestamp"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
+
+
+def _video_details(video_ids, api_key):
+    response = http_client.get(
+        f"{YOUTUBE_API}/videos",
+        params={'part': 'snippet,liveStreamingDetails', 'id': ','.join(video_ids), 'key': api_key}
+    )
+    if response.status_code != 200:
+        raise Exception(f"YouTube API error: {response.status_code}")
+
+    items = response.json().get('items', [])
+    # The snippet came for free - the description fetch after go-live can reuse it
+    for item in items:
+        video_details.remember(item['id'], item['snippet'])
+    return items
+
+
+def find_upcoming_broadcast(api_key, service_date, channel_id=YOUTUBE_CHANNEL_ID):
+    """Return the channel's broadcast scheduled on service_date, or None
+
+    Result is {'video_id', 'scheduled_start_time', 'title'}; when several are
+    scheduled that day the earliest wins.
+    """
+    response = http_client.get(
+        f"{YOUTUBE_API}/search",
+        params={'part': 'snippet', 'channelId': channel_id, 'eventType': 'upcoming',
+                'type': 'video', 'maxResults': 10, 'key': api_key}
+    )
+    if response.status_code != 200:
+        raise Exception(f"YouTube API error: {response.status_code}")
+
+    video_ids = [item['id']['videoId'] for item in response.json().get('items', [])]
+    if not video_ids:
+        return None
+
+    best = None
+    for item in _video_details(video_ids, api_key):
+        scheduled = item.get('liveStreamingDetails', {}).get('scheduledStartTime')
+        if not scheduled or parse_time(scheduled).date() != service_date:
+            continue
+        if best is None or scheduled < best['scheduled_start_time']:
+            best = {'video_id': item['id'], 'scheduled_start_time': scheduled, 'title': item['snippet']['title']}
+
+    return best
+
+
+def pre_resolve(api_key, service_date, channel_id=YOUTUBE_CHANNEL_ID):
+    """Return the broadcast for service_date from the state store, searching (and saving) if needed"""
+    broadcast = state_store.load_broadcast(channel_id, service_date)
+    if broadcast:
+        return broadcast
+
+    broadcast = find_upcoming_broadcast(api_key, service_date, channel_id)
+    if broadcast:
+        state_store.save_broadcast(channel_id, service_date, broadcast['video_id'], broadcast['scheduled_start_time'])
+    return broadcast
+
+
+def broadcast_state(video_id, api_key):
+    """'live', 'upcoming', 'ended' or None (video not found) for one video"""
+    items = _video_details([video_id], api_key)
+    return _state(items[0]) if items else None
+
+
+def _state(item):
+    details = item.get('liveStreamingDetails', {})
+    if details.get('actualEndTime'):
+        return 'ended'
+    if details.get('actualStartTime'):
+        return 'live'
+    return 'upcoming'
+
+
+def live_notification(entries, api_key, skip=None, channel_id=YOUTUBE_CHANNEL_ID):
+    """First pushed video (websub.parse_atom entries) of channel_id that is live right now, or None
+
+    A push also arrives when an old video is edited, so each id is confirmed
+    with one liveStreamingDetails check - which also confirms the video
+    really belongs to the channel the entry names.
+    """
+    pushed = (entry['video_id'] for entry in entries if not entry['deleted'] and entry['channel_id'] == channel_id)
+    for video_id in dict.fromkeys(pushed):
+        if video_id == skip:
+            continue
+        items = _video_details([video_id], api_key)
+        if items and items[0]['snippet'].get('channelId') == channel_id and _state(items[0]) == 'live':
+            return video_id
+    return None
+
+
+def wait_until_live(video_id, api_key, deadline, scheduled_start=None, log=print, notifications=None,
+                    channel_id=YOUTUBE_CHANNEL_ID):
+    """Poll one video until it is live or the deadline passes
+
+    Returns the id of the live video, or None. deadline and scheduled_start
+    are aware datetimes. Checks are spaced out while the scheduled start is
+    still far off and every POLL_INTERVAL seconds after it; an ended
+    broadcast counts as live, since it has a recording. With a WebSub
+    receiver (notifications) the waits end as soon as a push arrives: a push
+    for this video is checked at once, and a different video that is live
+    (the stream was re-created) is returned instead if it is channel_id's.
+    """
+    checks = 0
+    while True:
+        checks += 1
+        metrics.count('live_poll_attempts', method='videos')
+        state = broadcast_state(video_id, api_key)
+        if state in ('live', 'ended'):
+            log(f"Broadcast {video_id} is {state} (check {checks})")
+            return video_id
+        if state is None:
+            log(f"Broadcast {video_id} no longer exists")
+            return None
+
+        now = datetime.now(timezone.utc)
+        remaining = (deadline - now).total_seconds()
+        if remaining <= 0:
+            log(f"Broadcast {video_id} not live by {deadline.isoformat()} after {checks} checks")
+            return None
+
+        wait = POLL_INTERVAL
+        if scheduled_start and scheduled_start > now:
+            wait = min(max((scheduled_start - now).total_seconds() / 2, POLL_INTERVAL), MAX_POLL_INTERVAL)
+
+        if notifications is None:
+            time.sleep(min(wait, remaining))
+            continue
+
+        entries = notifications.wait(min(wait, remaining))
+        if entries:
+            log(f"WebSub push for {', '.join(entry['video_id'] for entry in entries)}")
+            other = live_notification(entries, api_key, skip=video_id, channel_id=channel_id)
+            if other:
+                log(f"Pushed video {other} is live instead of {video_id}")
+                return other
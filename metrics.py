@@ -0,0 +1,112 @@
+"""
+Run metrics
+Per-run counters and gauges (duration, API calls, retries, quota, poll attempts, backfill results)
+written as a Prometheus textfile-collector file for the node exporter
+"""
+
+import os
+import threading
+import time
+
+from decouple import config
+
+# Directory the node exporter's textfile collector reads (--collector.textfile.directory);
+# the export is off until it is set
+METRICS_DIR = config('METRICS_DIR', default='')
+
+PREFIX = 'pcoutils'
+
+# Every value describes the last run of a script, so all are exported as gauges
+HELP = {
+    'run_duration_seconds': "Wall time of the last run",
+    'run_success': "1 if the last run succeeded, else 0",
+    'run_finished_timestamp_seconds': "Unix time the last run finished",
+    'api_requests': "API calls in the last run by host, method and status",
+    'api_request_seconds': "Seconds spent in API calls in the last run by host and method",
+    'api_retries': "Requests re-sent in the last run after a connection error, 5xx or 429",
+    'youtube_quota_units': "YouTube Data API units charged in the last run by endpoint",
+    'live_poll_attempts': "Checks needed to find the live stream by method",
+    'live_update_seconds': "Seconds from the live stream being detected to the episode being fully updated",
+    'backfill_episodes': "Backfill episodes by result",
+}
+
+_values = {}
+_collectors = []
+_lock = threading.Lock()
+_started = time.monotonic()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def count(name, amount=1, **labels):
+    """Add amount to the named value for these labels"""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+
+
+def gauge(name, value, **labels):
+    """Set the named value for these labels"""
+    with _lock:
+        _values[_key(name, labels)] = value
+
+
+def add_collector(func):
+    """Call func (which sets gauges) just before each export"""
+    _collectors.append(func)
+
+
+def start_run():
+    """Forget the previous run's values and restart the run clock (the daemon calls this per job)"""
+    global _started
+    with _lock:
+        _values.clear()
+        _started = time.monotonic()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(script, success):
+    """The current run's values in the Prometheus text exposition format"""
+    gauge('run_duration_seconds', round(time.monotonic() - _started, 3))
+    gauge('run_success', 1 if success else 0)
+    gauge('run_finished_timestamp_seconds', round(time.time(), 3))
+    for func in _collectors:
+        func()
+
+    with _lock:
+        values = sorted(_values.items())
+
+    lines = []
+    described = set()
+    for (name, labels), value in values:
+        metric = f"{PREFIX}_{name}"
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} gauge")
+        label_text = ','.join(f'{label}="{_escape(text)}"' for label, text in (('script', script),) + labels)
+        lines.append(f"{metric}{{{label_text}}} {round(value, 3) if isinstance(value, float) else value}")
+    return '\n'.join(lines) + '\n'
+
+
+def write(script, success, directory=METRICS_DIR):
+    """Write <directory>/pcoutils_<script>.prom; returns the path, or None when disabled
+
+    The file is written beside its final name and renamed into place, so the
+    collector never reads half a file.
+    """
+    if not directory:
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{PREFIX}_{script.replace('-', '_')}.prom")
+    text = render(script, success)
+    with open(f"{path}.tmp", "w") as f:
+        f.write(text)
+    os.replace(f"{path}.tmp", path)
+    return path
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Planning Center Publishing and YouTube Data APIs
+Serves the endpoints the scripts call from seeded data, with per-endpoint latency, PCO rate-limit
+headers and 429/5xx injection, so the scripts can be run and measured with no network
+
+    python mock_api.py --latency '*=80' --latency search=250 --fail '*=0.02' --throttle episodes_list=0.05
+    PCO_API_BASE=http://127.0.0.1:8093/publishing/v2 YOUTUBE_API_BASE=http://127.0.0.1:8094/youtube/v3 python main.py
+
+Endpoint names for --latency, --fail and --throttle: episodes_list, episode_create, episode_patch,
+episode_times_list, episode_time_patch, search, videos, playlistItems, channels ('*' for all).
+GET /_mock/stats on either port returns the request counts so far.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import signal
+import string
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from channels import CHANNELS
+
+PCO_PREFIX = '/publishing/v2'
+YOUTUBE_PREFIX = '/youtube/v3'
+
+# (method, path pattern, endpoint name) - the name keys latency and fault settings
+PCO_ROUTES = [
+    ('GET', re.compile(r'/channels/(\w+)/episodes$'), 'episodes_list'),
+    ('POST', re.compile(r'/channels/(\w+)/episodes$'), 'episode_create'),
+    ('GET', re.compile(r'/episodes/(\w+)/?$'), 'episode_get'),
+    ('PATCH', re.compile(r'/episodes/(\w+)/?$'), 'episode_patch'),
+    ('GET', re.compile(r'/episodes/(\w+)/episode_times$'), 'episode_times_list'),
+    ('PATCH', re.compile(r'/episodes/(\w+)/episode_times/(\w+)$'), 'episode_time_patch'),
+]
+YOUTUBE_ROUTES = [
+    ('GET', re.compile(r'/(search)$'), 'search'),
+    ('GET', re.compile(r'/(videos)$'), 'videos'),
+    ('GET', re.compile(r'/(playlistItems)$'), 'playlistItems'),
+    ('GET', re.compile(r'/(channels)$'), 'channels'),
+]
+ENDPOINTS = [name for _, _, name in PCO_ROUTES + YOUTUBE_ROUTES]
+
+# Units the real API charges; the rest cost 1
+YOUTUBE_COSTS = {'search': 100}
+
+DESCRIPTION = "Join us for worship and the message. Service notes and giving: https://example.org/sunday\n" * 4
+
+
+def iso(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def last_sunday_before(day):
+    return day - timedelta(days=(day.weekday() + 1) % 7 or 7)
+
+
+class MockData:
+    """Seeded episodes and videos, changed in place by the write endpoints
+
+    `sundays` past Sundays each get a Sunday Service upload (unless it falls
+    in the missing_videos fraction) and a Planning Center episode (unless in
+    missing_episodes); Wednesdays get a Bible Study upload and episode.
+    Today has a broadcast scheduled at the Sunday channel's start time that
+    goes live `live_after` seconds after the data is created.
+    """
+
+    def __init__(self, seed=1, sundays=60, today=None, missing_episodes=0.2, missing_videos=0.05, live_after=0.0):
+        self.rng = random.Random(seed)
+        self.today = today or datetime.now(timezone.utc).date()
+        self.lock = threading.Lock()
+        self.episodes = {}
+        self.episode_times = {}
+        self.videos = {}
+        self.next_id = 100000
+        self.clock = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+        sunday_channel, wednesday_channel = CHANNELS
+        self.youtube_channel_id = sunday_channel['youtube_channel_id']
+
+        last = last_sunday_before(self.today)
+        for week in range(sundays, 0, -1):
+            sunday = last - timedelta(weeks=week - 1)
+            wednesday = sunday - timedelta(days=4)
+
+            if self.rng.random() >= missing_videos:
+                self._add_video(f"Sunday Service - {sunday:%B %d, %Y}", sunday, hour=15, streamed=True)
+            self._add_video(f"Wednesday Night Bible Study - {wednesday:%B %d, %Y}", wednesday, hour=1)
+
+            if self.rng.random() >= missing_episodes:
+                self._add_episode(sunday_channel, sunday)
+            self._add_episode(wednesday_channel, wednesday)
+
+        start = sunday_channel['starts_at']
+        self.broadcast = self._add_video(f"Sunday Service - {self.today:%B %d, %Y}", self.today, hour=int(start[:2]),
+                                         minute=int(start[3:]), streamed=True)
+        self.broadcast['live_at'] = time.time() + live_after
+
+    def _video_id(self):
+        return ''.join(self.rng.choice(string.ascii_letters + string.digits + '-_') for _ in range(11))
+
+    def _add_video(self, title, day, hour, minute=0, streamed=False):
+        published = datetime(day.year, day.month, day.day, hour, minute, tzinfo=timezone.utc)
+        video = {
+            'id': self._video_id(),
+            'title': title,
+            'published_at': iso(published),
+            'description': f"{title}\n\n{DESCRIPTION}",
+            'streamed': streamed,
+            'live_at': None,
+        }
+        self.videos[video['id']] = video
+        return video
+
+    def _new_id(self):
+        self.next_id += 1
+        return str(self.next_id)
+
+    def _timestamp(self):
+        """Strictly increasing updated_at values, like the server's own"""
+        self.clock = max(self.clock + timedelta(milliseconds=1), datetime.now(timezone.utc))
+        return self.clock.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+    def _add_episode(self, channel, day, attributes=None):
+        starts_at = f"{day:%Y-%m-%d}T{channel['starts_at']}:00Z"
+        episode_id, time_id = self._new_id(), self._new_id()
+        self.episodes[episode_id] = {
+            'id': episode_id,
+            'channel_id': str(channel['pco_channel_id']),
+            'attributes': attributes or {
+                'title': channel['title'].format(date=day),
+                'published_live_at': starts_at,
+                'published_to_library_at': starts_at,
+                'library_video_url': None,
+                'description': None,
+            },
+            'time_ids': [time_id],
+        }
+        self.episodes[episode_id]['attributes']['updated_at'] = self._timestamp()
+        self.episode_times[time_id] = {
+            'id': time_id,
+            'episode_id': episode_id,
+            # Seeded episodes were embedded long ago; one created through the API starts without an embed
+            'attributes': {'starts_at': starts_at, 'video_embed_code': None if attributes else channel['embed'],
+                           'updated_at': self._timestamp()},
+        }
+        return self.episodes[episode_id]
+
+    def video_state(self, video):
+        if video['live_at'] is None:
+            return 'ended' if video['streamed'] else 'none'
+        return 'live' if time.time() >= video['live_at'] else 'upcoming'
+
+
+def episode_resource(episode):
+    return {
+        'type': 'Episode',
+        'id': episode['id'],
+        'attributes': dict(episode['attributes']),
+        'relationships': {
+            'channel': {'data': {'type': 'Channel', 'id': episode['channel_id']}},
+            'episode_times': {'data': [{'type': 'EpisodeTime', 'id': time_id} for time_id in episode['time_ids']]},
+        },
+    }
+
+
+def episode_time_resource(episode_time):
+    return {'type': 'EpisodeTime', 'id': episode_time['id'], 'attributes': dict(episode_time['attributes'])}
+
+
+class MockAPI:
+    """The PCO and YouTube mock servers, each on its own port
+
+    latency maps endpoint names (or '*') to milliseconds; fail and throttle
+    map them to the fraction of requests answered with a 5xx or a 429.
+    PCO responses carry the rate-limit headers and a request over rate_limit
+    per rate_period seconds gets a 429 with Retry-After. youtube_quota, when
+    set, is the number of units served before every call gets quotaExceeded.
+    """
+
+    def __init__(self, data=None, latency=None, fail=None, throttle=None, rate_limit=100, rate_period=20,
+                 youtube_quota=None, seed=1, host='127.0.0.1', pco_port=0, youtube_port=0):
+        self.data = data or MockData(seed=seed)
+        self.latency = latency or {}
+        self.fail = fail or {}
+        self.throttle = throttle or {}
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.youtube_quota = youtube_quota
+        self.faults = random.Random(seed)
+        self.host = host
+        self.ports = {'pco': pco_port, 'youtube': youtube_port}
+        self.servers = {}
+        self.stats = Counter()
+        self.bytes_sent = 0
+        self.quota_used = 0
+        self.window = (0.0, 0)
+        self._lock = threading.Lock()
+
+    @property
+    def pco_url(self):
+        return f"http://{self.host}:{self.servers['pco'].server_port}{PCO_PREFIX}"
+
+    @property
+    def youtube_url(self):
+        return f"http://{self.host}:{self.servers['youtube'].server_port}{YOUTUBE_PREFIX}"
+
+    def environment(self):
+        """Environment variables that point the scripts at this mock"""
+        return {'PCO_API_BASE': self.pco_url, 'YOUTUBE_API_BASE': self.youtube_url}
+
+    def start(self):
+        for api, routes, prefix in (('pco', PCO_ROUTES, PCO_PREFIX), ('youtube', YOUTUBE_ROUTES, YOUTUBE_PREFIX)):
+            server = ThreadingHTTPServer((self.host, self.ports[api]), make_handler(self, api, routes, prefix))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f"mock-{api}", daemon=True).start()
+            self.servers[api] = server
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def snapshot(self):
+        with self._lock:
+            return {'requests': dict(self.stats), 'total': sum(self.stats.values()),
+                    'bytes_sent': self.bytes_sent, 'youtube_quota_used': self.quota_used}
+
+    def _setting(self, table, endpoint, default=0):
+        return table.get(endpoint, table.get('*', default))
+
+    def _rate_window(self):
+        """Requests counted in the current PCO rate window (this one included) and seconds left in it"""
+        with self._lock:
+            now = time.monotonic()
+            started, count = self.window
+            if now - started >= self.rate_period:
+                started, count = now, 0
+            self.window = (started, count + 1)
+            return count + 1, self.rate_period - (now - started)
+
+    # PCO
+
+    def episodes_list(self, query, channel_id):
+        per_page = min(int(query.get('per_page', 25)), 100)
+        offset = int(query.get('offset', 0))
+        order = query.get('order', '-published_live_at')
+        search = query.get('where[search]', '').lower()
+        include_times = 'episode_times' in query.get('include', '')
+
+        with self.data.lock:
+            episodes = [episode for episode in self.data.episodes.values()
+                        if episode['channel_id'] == channel_id
+                        and search in (episode['attributes'].get('title') or '').lower()]
+            field = order.lstrip('-')
+            episodes.sort(key=lambda episode: episode['attributes'].get(field) or '', reverse=order.startswith('-'))
+            page = episodes[offset:offset + per_page]
+            document = {'data': [episode_resource(episode) for episode in page], 'meta': {'total_count': len(episodes)}}
+            if include_times:
+                document['included'] = [episode_time_resource(self.data.episode_times[time_id])
+                                        for episode in page for time_id in episode['time_ids']]
+
+        document['links'] = {}
+        if offset + per_page < len(episodes):
+            next_query = dict(query, offset=offset + per_page)
+            document['links']['next'] = f"{self.pco_url}/channels/{channel_id}/episodes?{urlencode(next_query)}"
+        return 200, document
+
+    def episode_create(self, query, channel_id, body):
+        channel = next((channel for channel in CHANNELS if str(channel['pco_channel_id']) == channel_id), None)
+        if channel is None:
+            return 404, {'errors': [{'status': '404', 'title': 'Not Found'}]}
+
+        attributes = dict(body.get('data', {}).get('attributes', {}))
+        attributes.setdefault('published_live_at', attributes.get('published_to_library_at'))
+        with self.data.lock:
+            day = datetime.strptime((attributes.get('published_live_at') or iso(datetime.now(timezone.utc)))[:10],
+                                    '%Y-%m-%d').date()
+            episode = self.data._add_episode(channel, day, attributes)
+            document = {'data': episode_resource(episode)}
+            if 'episode_times' in query.get('include', ''):
+                document['included'] = [episode_time_resource(self.data.episode_times[time_id])
+                                        for time_id in episode['time_ids']]
+        return 201, document
+
+    def episode_get(self, query, episode_id):
+        with self.data.lock:
+            episode = self.data.episodes.get(episode_id)
+            if episode is None:
+                return 404, {'errors': [{'status': '404', 'title': 'Not Found'}]}
+            document = {'data': episode_resource(episode)}
+            if 'episode_times' in query.get('include', ''):
+                document['included'] = [episode_time_resource(self.data.episode_times[time_id])
+                                        for time_id in episode['time_ids']]
+        return 200, document
+
+    def episode_patch(self, query, episode_id, body):
+        with self.data.lock:
+            episode = self.data.episodes.get(episode_id)
+            if episode is None:
+                return 404, {'errors': [{'status': '404', 'title': 'Not Found'}]}
+            episode['attributes'].update(body.get('data', {}).get('attributes', {}))
+            episode['attributes']['updated_at'] = self.data._timestamp()
+            return 200, {'data': episode_resource(episode)}
+
+    def episode_times_list(self, query, episode_id):
+        with self.data.lock:
+            episode = self.data.episodes.get(episode_id)
+            if episode is None:
+                return 404, {'errors': [{'status': '404', 'title': 'Not Found'}]}
+            return 200, {'data': [episode_time_resource(self.data.episode_times[time_id])
+                                  for time_id in episode['time_ids']]}
+
+    def episode_time_patch(self, query, episode_id, time_id, body):
+        with self.data.lock:
+            episode_time = self.data.episode_times.get(time_id)
+            if episode_time is None or episode_time['episode_id'] != episode_id:
+                return 404, {'errors': [{'status': '404', 'title': 'Not Found'}]}
+            episode_time['attributes'].update(body.get('data', {}).get('attributes', {}))
+            episode_time['attributes']['updated_at'] = self.data._timestamp()
+            self.data.episodes[episode_id]['attributes']['updated_at'] = self.data._timestamp()
+            return 200, {'data': episode_time_resource(episode_time)}
+
+    # YouTube
+
+    def _snippet(self, video, state):
+        return {
+            'publishedAt': video['published_at'],
+            'channelId': self.data.youtube_channel_id,
+            'title': video['title'],
+            'description': video['description'],
+            'liveBroadcastContent': state if state in ('live', 'upcoming') else 'none',
+        }
+
+    def _published(self, channel_id):
+        """(video, state) for the channel's videos, newest first"""
+        if channel_id and channel_id != self.data.youtube_channel_id:
+            return []
+        videos = sorted(self.data.videos.values(), key=lambda video: video['published_at'], reverse=True)
+        return [(video, self.data.video_state(video)) for video in videos]
+
+    def search(self, query, _):
+        event_type = query.get('eventType')
+        after, before = query.get('publishedAfter', ''), query.get('publishedBefore', '~')
+        limit = min(int(query.get('maxResults', 5)), 50)
+
+        items = []
+        for video, state in self._published(query.get('channelId')):
+            if event_type and state != event_type:
+                continue
+            if not event_type and state == 'upcoming':
+                continue
+            if not after <= video['published_at'] <= before:
+                continue
+            snippet = self._snippet(video, state)
+            snippet['description'] = snippet['description'][:160]
+            items.append({'kind': 'youtube#searchResult', 'id': {'kind': 'youtube#video', 'videoId': video['id']},
+                          'snippet': snippet})
+        return 200, {'kind': 'youtube#searchListResponse', 'items': items[:limit],
+                     'pageInfo': {'totalResults': len(items), 'resultsPerPage': limit}}
+
+    def videos(self, query, _):
+        items = []
+        for video_id in query.get('id', '').split(','):
+            video = self.data.videos.get(video_id)
+            if video is None:
+                continue
+            state = self.data.video_state(video)
+            item = {'kind': 'youtube#video', 'id': video_id, 'snippet': self._snippet(video, state)}
+            if 'liveStreamingDetails' in query.get('part', '') and state != 'none':
+                details = {'scheduledStartTime': video['published_at']}
+                if state in ('live', 'ended'):
+                    details['actualStartTime'] = video['published_at']
+                if state == 'ended':
+                    details['actualEndTime'] = video['published_at'][:11] + '16:00:00Z'
+                item['liveStreamingDetails'] = details
+            items.append(item)
+        return 200, {'kind': 'youtube#videoListResponse', 'items': items}
+
+    def playlistItems(self, query, _):
+        uploads = 'UU' + self.data.youtube_channel_id[2:]
+        if query.get('playlistId') != uploads:
+            return 404, {'error': {'code': 404, 'message': 'playlistNotFound',
+                                   'errors': [{'reason': 'playlistNotFound'}]}}
+
+        limit = min(int(query.get('maxResults', 5)), 50)
+        offset = int(query.get('pageToken', 'p0')[1:])
+        videos = self._published(None)
+        items = [
+            {
+                'kind': 'youtube#playlistItem',
+                'snippet': {'publishedAt': video['published_at'], 'title': video['title'],
+                            'resourceId': {'kind': 'youtube#video', 'videoId': video['id']}},
+                'contentDetails': {'videoId': video['id'], 'videoPublishedAt': video['published_at']},
+            }
+            for video, _ in videos[offset:offset + limit]
+        ]
+        document = {'kind': 'youtube#playlistItemListResponse', 'items': items,
+                    'pageInfo': {'totalResults': len(videos), 'resultsPerPage': limit}}
+        if offset + limit < len(videos):
+            document['nextPageToken'] = f"p{offset + limit}"
+        return 200, document
+
+    def channels(self, query, _):
+        items = []
+        if query.get('id') == self.data.youtube_channel_id:
+            uploads = 'UU' + self.data.youtube_channel_id[2:]
+            items.append({'kind': 'youtube#channel', 'id': self.data.youtube_channel_id,
+                          'contentDetails': {'relatedPlaylists': {'uploads': uploads}}})
+        return 200, {'kind': 'youtube#channelListResponse', 'items': items}
+
+
+def make_handler(mock, api, routes, prefix):
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so the scripts' pooled connections are reused as against the real APIs
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, document, headers=None):
+            body = json.dumps(document).encode() if document is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, str(value))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+            with mock._lock:
+                mock.bytes_sent += len(body)
+
+        def _handle(self):
+            parts = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+
+            if parts.path == '/_mock/stats':
+                return self._send(200, mock.snapshot())
+            if not parts.path.startswith(prefix):
+                return self._send(200 if self.command == 'HEAD' else 404, None)
+
+            path = parts.path[len(prefix):]
+            for method, pattern, endpoint in routes:
+                match = pattern.match(path)
+                if method == self.command and match:
+                    break
+            else:
+                return self._send(404, {'errors': [{'status': '404', 'title': 'Not Found'}]})
+
+            query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+            with mock._lock:
+                mock.stats[endpoint] += 1
+
+            time.sleep(mock._setting(mock.latency, endpoint) / 1000)
+
+            headers = {}
+            if api == 'pco':
+                count, remaining = mock._rate_window()
+                headers = {'X-PCO-API-Request-Rate-Limit': mock.rate_limit,
+                           'X-PCO-API-Request-Rate-Period': mock.rate_period,
+                           'X-PCO-API-Request-Rate-Count': min(count, mock.rate_limit)}
+                if count > mock.rate_limit:
+                    headers['Retry-After'] = math.ceil(remaining)
+                    return self._send(429, {'errors': [{'status': '429', 'title': 'Too Many Requests'}]}, headers)
+            elif 'key' not in query:
+                return self._send(400, {'error': {'code': 400, 'message': 'API key missing',
+                                                  'errors': [{'reason': 'keyInvalid'}]}})
+            else:
+                units = YOUTUBE_COSTS.get(endpoint, 1)
+                with mock._lock:
+                    exhausted = mock.youtube_quota is not None and mock.quota_used + units > mock.youtube_quota
+                    if not exhausted:
+                        mock.quota_used += units
+                if exhausted:
+                    return self._send(403, {'error': {'code': 403, 'message': 'quota exceeded',
+                                                      'errors': [{'reason': 'quotaExceeded'}]}})
+
+            with mock._lock:
+                roll = mock.faults.random()
+            throttle = mock._setting(mock.throttle, endpoint)
+            if roll < throttle:
+                return self._send(429, {'errors': [{'status': '429', 'title': 'Too Many Requests'}]},
+                                  dict(headers, **{'Retry-After': 1}))
+            if roll < throttle + mock._setting(mock.fail, endpoint):
+                return self._send(mock.faults.choice([500, 502, 503]), {'errors': [{'title': 'Injected fault'}]},
+                                  headers)
+
+            arguments = list(match.groups())
+            if self.command in ('POST', 'PATCH'):
+                arguments.append(json.loads(raw or b'{}'))
+            status, document = getattr(mock, endpoint)(query, *arguments)
+            self._send(status, document, headers)
+
+        do_GET = _handle
+        do_POST = _handle
+        do_PATCH = _handle
+        do_HEAD = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def parse_settings(values, cast=float):
+    """['search=250', '*=80'] -> {'search': 250.0, '*': 80.0}"""
+    settings = {}
+    for value in values or []:
+        name, _, number = value.partition('=')
+        if name != '*' and name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name} (one of {', '.join(ENDPOINTS)} or *)")
+        settings[name] = cast(number)
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve mock Planning Center and YouTube APIs from seeded data")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--pco-port', type=int, default=8093)
+    parser.add_argument('--youtube-port', type=int, default=8094)
+    parser.add_argument('--seed', type=int, default=1, help="seed for the data and the injected faults")
+    parser.add_argument('--sundays', type=int, default=60, help="past Sundays to seed")
+    parser.add_argument('--missing-episodes', type=float, default=0.2, help="fraction of Sundays without an episode")
+    parser.add_argument('--missing-videos', type=float, default=0.05, help="fraction of Sundays without an upload")
+    parser.add_argument('--live-after', type=float, default=30.0, help="seconds until today's broadcast goes live")
+    parser.add_argument('--latency', action='append', metavar='ENDPOINT=MS', help="response delay (repeatable)")
+    parser.add_argument('--fail', action='append', metavar='ENDPOINT=RATE', help="fraction answered with a 5xx")
+    parser.add_argument('--throttle', action='append', metavar='ENDPOINT=RATE', help="fraction answered with a 429")
+    parser.add_argument('--rate-limit', type=int, default=100, help="PCO requests allowed per rate period")
+    parser.add_argument('--rate-period', type=int, default=20, help="PCO rate period in seconds")
+    parser.add_argument('--youtube-quota', type=int, default=None, help="YouTube units served before quotaExceeded")
+    args = parser.parse_args()
+
+    try:
+        latency, fail, throttle = (parse_settings(values) for values in (args.latency, args.fail, args.throttle))
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    data = MockData(seed=args.seed, sundays=args.sundays, missing_episodes=args.missing_episodes,
+                    missing_videos=args.missing_videos, live_after=args.live_after)
+    mock = MockAPI(data, latency=latency, fail=fail, throttle=throttle, rate_limit=args.rate_limit,
+                   rate_period=args.rate_period, youtube_quota=args.youtube_quota, seed=args.seed,
+                   host=args.host, pco_port=args.pco_port, youtube_port=args.youtube_port).start()
+
+    print(f"[mock] {len(data.episodes)} episodes, {len(data.videos)} videos; "
+          f"broadcast {data.broadcast['id']} live in {args.live_after:g}s", flush=True)
+    for name, value in mock.environment().items():
+        print(f"[mock] {name}={value}", flush=True)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.stop()
+        print(f"[mock] {json.dumps(mock.snapshot())}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+YouTube Data API quota ledger
+Charges every YouTube call against a persistent daily ledger (the quota day resets at midnight
+Pacific) and holds back a reserve so non-critical work cannot starve the Sunday live update
+"""
+
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo
+
+from decouple import config
+
+import database
+
+# Units charged per call, keyed by the last path segment of the endpoint
+# (https://developers.google.com/youtube/v3/determine_quota_cost)
+COSTS = {
+    'search': 100,
+    'videos': 1,
+    'channels': 1,
+    'playlistItems': 1,
+    'playlists': 1,
+    'liveBroadcasts': 1,
+}
+DEFAULT_COST = 1
+
+# YouTube's quota day starts at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+DAILY_QUOTA = config('YT_DAILY_QUOTA', default=10000, cast=int)
+
+# Held back for the live update: the worst case is the 30-search fallback loop plus a few checks
+LIVE_RESERVE = config('YT_LIVE_RESERVE', default=3200, cast=int)
+
+# Units each priority must leave unspent. 'live' is never refused - if the ledger is
+# wrong, YouTube has the final word. Backfill runs at 'background' and on Sundays
+# also leaves the live update a second reserve, since it may still need to fall back.
+RESERVES = {
+    'live': 0,
+    'normal': LIVE_RESERVE,
+    'background': LIVE_RESERVE,
+}
+SUNDAY_EXTRA_RESERVE = LIVE_RESERVE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS youtube_quota (
+    quota_day TEXT PRIMARY KEY,
+    units INTEGER NOT NULL DEFAULT 0,
+    exhausted INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+database.register(SCHEMA)
+
+
+class QuotaBudgetError(Exception):
+    """Raised instead of sending a YouTube call the budget does not allow"""
+
+
+def quota_day(now=None):
+    """The Pacific calendar date the quota is currently counted against"""
+    return (now or datetime.now(QUOTA_TIMEZONE)).astimezone(QUOTA_TIMEZONE).date()
+
+
+def resets_at(now=None):
+    """Aware datetime of the next quota reset (midnight Pacific)"""
+    tomorrow = quota_day(now) + timedelta(days=1)
+    return datetime.combine(tomorrow, time(0), tzinfo=QUOTA_TIMEZONE)
+
+
+def endpoint(url):
+    return urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def cost(url):
+    """Quota units a call to the given YouTube URL costs"""
+    return COSTS.get(endpoint(url), DEFAULT_COST)
+
+
+def _quota_exceeded(response):
+    if response.status_code != 403:
+        return False
+    try:
+        errors = response.json()['error']['errors']
+    except (ValueError, KeyError, TypeError):
+        return False
+    return any(error.get('reason') in ('quotaExceeded', 'dailyLimitExceeded') for error in errors)
+
+
+class QuotaLedger:
+    """Daily YouTube quota usage shared by every process using the cache database
+
+    check() is called before a request and raises QuotaBudgetError when the
+    current priority may not spend the units; charge() is called with every
+    response received. Units spent by this process are kept per endpoint for
+    the run summary.
+    """
+
+    def __init__(self, daily_quota=DAILY_QUOTA, priority='normal'):
+        self.daily_quota = daily_quota
+        self.priority = priority
+        self.spent = Counter()
+        self._lock = threading.Lock()
+
+    def used(self):
+        """Units recorded against today's quota by every run"""
+        with database.lock:
+            row = database.connect().execute(
+                "SELECT units, exhausted FROM youtube_quota WHERE quota_day = ?",
+                (quota_day().isoformat(),)
+            ).fetchone()
+        if row is None:
+            return 0
+        units, exhausted = row
+        return max(units, self.daily_quota) if exhausted else units
+
+    def remaining(self):
+        return max(self.daily_quota - self.used(), 0)
+
+    def reserve(self, priority=None):
+        """Units the given priority (default: the ledger's) must leave unspent"""
+        priority = priority or self.priority
+        reserve = RESERVES[priority]
+        if priority == 'background' and quota_day().weekday() == 6:
+            reserve += SUNDAY_EXTRA_RESERVE
+        return reserve
+
+    def available(self, priority=None):
+        """Units the given priority may still spend today"""
+        priority = priority or self.priority
+        if priority == 'live':
+            return self.daily_quota
+        return max(self.remaining() - self.reserve(priority), 0)
+
+    def allows(self, units, priority=None):
+        return units <= self.available(priority)
+
+    def check(self, url):
+        units = cost(url)
+        if not self.allows(units):
+            raise QuotaBudgetError(
+                f"YouTube quota budget: {endpoint(url)} needs {units} units, "
+                f"{self.available()} available to {self.priority} work until {resets_at():%Y-%m-%d %H:%M %Z}"
+            )
+
+    def charge(self, url, response=None):
+        """Record one call; a quotaExceeded response marks the day as spent"""
+        units = cost(url)
+        exhausted = 1 if response is not None and _quota_exceeded(response) else 0
+
+        with self._lock:
+            self.spent[endpoint(url)] += units
+
+        with database.lock:
+            db = database.connect()
+            db.execute(
+                """INSERT INTO youtube_quota (quota_day, units, exhausted) VALUES (?, ?, ?)
+                   ON CONFLICT(quota_day) DO UPDATE SET
+                       units = units + excluded.units,
+                       exhausted = MAX(exhausted, excluded.exhausted)""",
+                (quota_day().isoformat(), units, exhausted)
+            )
+            db.commit()
+
+    def summary(self):
+        with self._lock:
+            total = sum(self.spent.values())
+            by_endpoint = ', '.join(f"{name} {units}" for name, units in self.spent.most_common())
+        detail = f" ({by_endpoint})" if by_endpoint else ""
+        return f"{total} units this run{detail}, {self.used()} of {self.daily_quota} used today"
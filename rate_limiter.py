@@ -0,0 +1,93 @@
+"""
+Adaptive rate limiter for the Planning Center API
+Token bucket that paces itself from PCO's rate-limit response headers and Retry-After
+"""
+
+import threading
+import time
+
+# Planning Center's documented default: 100 requests per 20 seconds
+DEFAULT_LIMIT = 100
+DEFAULT_PERIOD = 20
+
+LIMIT_HEADER = 'X-PCO-API-Request-Rate-Limit'
+PERIOD_HEADER = 'X-PCO-API-Request-Rate-Period'
+COUNT_HEADER = 'X-PCO-API-Request-Rate-Count'
+
+
+def _header_number(response, name):
+    value = response.headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Token bucket shared by every caller of one API
+
+    Each request takes a token; tokens refill at limit / period per second.
+    update() is fed every response so the bucket follows the server's view:
+    the advertised limit and period resize it, the current request count
+    drains it, and a 429 Retry-After blocks all callers until it expires.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, period=DEFAULT_PERIOD):
+        self.limit = limit
+        self.period = period
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.limit / self.period
+
+    def _refill(self, now):
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+                self.waited += wait
+
+            time.sleep(wait)
+
+    def retry_after(self, response):
+        """Seconds to wait before retrying a 429, from Retry-After (else one token's worth)"""
+        seconds = _header_number(response, 'Retry-After')
+        return seconds if seconds is not None else 1 / self.rate
+
+    def update(self, response):
+        """Adjust the bucket from a response's rate-limit headers"""
+        limit = _header_number(response, LIMIT_HEADER)
+        period = _header_number(response, PERIOD_HEADER)
+        count = _header_number(response, COUNT_HEADER)
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if limit and period:
+                self.limit = limit
+                self.period = period
+
+            if count is not None:
+                # The server has seen `count` requests this period - never assume more headroom than that
+                self.tokens = min(self.tokens, max(self.limit - count, 0))
+
+            if response.status_code == 429:
+                self.tokens = 0
+                self.blocked_until = max(self.blocked_until, now + self.retry_after(response))
@@ -0,0 +1,101 @@
+"""
+Retry policy and circuit breaker for API calls
+Exponential backoff with full jitter for idempotent requests, and a per-host breaker that
+stops hammering a host that keeps failing
+"""
+
+import random
+import threading
+import time
+
+import requests
+
+# Status codes worth another attempt - the request may succeed on a healthy backend
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+# Methods retried by default. Every PATCH in these scripts sets absolute attribute
+# values, so repeating one is harmless; POST (episode creation) never is.
+RETRY_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'PATCH'}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host whose breaker is open"""
+
+
+class RetryStats:
+    """Retry counters for the run summary"""
+
+    def __init__(self):
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, delay):
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += delay
+
+    def summary(self):
+        return f"{self.retries} retries, {self.backoff_seconds:.1f}s backoff"
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n waits uniform(0, min(cap, base * 2^n))"""
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0, stats=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = stats or RetryStats()
+
+    def can_retry(self, attempt):
+        return attempt + 1 < self.max_attempts
+
+    def backoff(self, attempt):
+        """Sleep before retry number attempt + 1 and record it"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        self.stats.record(delay)
+        time.sleep(delay)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one trial request is let through (half-open) and its
+    outcome closes or re-opens the breaker."""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+        raise CircuitOpenError(f"Circuit open for {self.name} after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def abandon_trial(self):
+        """Forget a trial that ended without an outcome (e.g. an unexpected exception),
+        so the next request after the timeout becomes the trial instead"""
+        with self._lock:
+            self.trial_in_flight = False
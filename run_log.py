@@ -0,0 +1,176 @@
+"""
+Buffered run logger
+Drop-in log_message/log_separator that hand lines to a background writer thread, which appends
+them to the log file in batches (and optionally to a JSON-lines file) and is flushed at exit
+"""
+
+import atexit
+import json
+import queue
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from decouple import config
+
+# Also write <log name>.jsonl with one JSON object per message
+LOG_JSON = config('LOG_JSON', default=False, cast=bool)
+
+# Lines written per batch at most; the writer drains whatever is queued up to this
+MAX_BATCH = 500
+
+# Fields every JSON line carries (None when not known for that message); http_status and
+# latency_ms are those of the thread's latest API call (see record_http)
+JSON_FIELDS = ('ts', 'run_id', 'script', 'message', 'step', 'episode_id', 'http_status', 'latency_ms')
+
+_run_id = uuid.uuid4().hex[:12]
+_context = threading.local()
+_http = threading.local()
+_loggers = []
+
+
+def run_id():
+    return _run_id
+
+
+def start_run():
+    """Begin a new run id (the daemon calls this before each job)"""
+    global _run_id
+    _run_id = uuid.uuid4().hex[:12]
+    return _run_id
+
+
+@contextmanager
+def context(**fields):
+    """Attach fields (step, episode_id, ...) to every message logged by this thread inside the block"""
+    previous = getattr(_context, 'fields', {})
+    _context.fields = dict(previous, **fields)
+    try:
+        yield
+    finally:
+        _context.fields = previous
+
+
+def add_context(**fields):
+    """Add fields to this thread's current context() block (dropped when the block ends)"""
+    _context.fields = dict(getattr(_context, 'fields', {}), **fields)
+
+
+def current_fields():
+    """The context() and record_http() fields this thread's next message would carry"""
+    return dict(getattr(_http, 'fields', {}), **getattr(_context, 'fields', {}))
+
+
+def record_http(status, latency_ms):
+    """Set the http_status and latency_ms of this thread's following messages (kept past context() blocks)"""
+    _http.fields = {'http_status': status, 'latency_ms': latency_ms}
+
+
+class RunLogger:
+    """Log file writer fed through a queue by a background thread
+
+    log_message() only formats the line and queues it, so callers never wait
+    on the file. The writer drains everything queued into one write per
+    batch. flush() blocks until all queued lines are on disk; every logger
+    is flushed and closed at interpreter exit.
+    """
+
+    def __init__(self, path, json_output=LOG_JSON):
+        self.path = path
+        self.script = path.rsplit('.', 1)[0]
+        self.json_path = f"{self.script}.jsonl" if json_output else None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name=f"log-{self.script}", daemon=True)
+                self._thread.start()
+                if self not in _loggers:
+                    _loggers.append(self)
+
+    def _write_loop(self):
+        text_file = open(self.path, "a")
+        json_file = open(self.json_path, "a") if self.json_path else None
+
+        try:
+            while True:
+                items = [self._queue.get()]
+                while len(items) < MAX_BATCH:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = None in items
+                lines = [item for item in items if item is not None]
+
+                text_file.write(''.join(text for text, _ in lines))
+                text_file.flush()
+                if json_file is not None:
+                    json_file.write(''.join(record for _, record in lines if record))
+                    json_file.flush()
+
+                for _ in items:
+                    self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            text_file.close()
+            if json_file is not None:
+                json_file.close()
+
+    def log_message(self, message, also_print=True, **fields):
+        """Write message to log file and optionally print to console
+
+        Keyword fields (step, episode_id, http_status, latency_ms) go to the
+        JSON-lines output along with any set through context().
+        """
+        now = datetime.now()
+        text = f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n"
+
+        record = None
+        if self.json_path:
+            values = dict(current_fields(), **fields)
+            values.update(ts=now.isoformat(timespec='milliseconds'), run_id=_run_id, script=self.script, message=message)
+            ordered = {name: values.pop(name, None) for name in JSON_FIELDS}
+            ordered.update(values)
+            record = json.dumps(ordered, default=str) + "\n"
+
+        self._ensure_writer()
+        self._queue.put((text, record))
+
+        if also_print:
+            # One write per line so concurrent threads do not interleave mid-line
+            sys.stdout.write(f"{message}\n")
+
+    def log_separator(self):
+        """Write separator line with timestamp to log file"""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._ensure_writer()
+        self._queue.put((f"{'='*50} {timestamp} {'='*50}\n", None))
+
+    def flush(self):
+        """Block until every queued line has been written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+def _close_all():
+    for logger in list(_loggers):
+        logger.close()
+    sys.stdout.flush()
+
+
+atexit.register(_close_all)
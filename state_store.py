@@ -0,0 +1,147 @@
+"""
+Episode handoff store
+Records the episode and episode_time ids created for each (channel, service date), and the
+YouTube broadcast scheduled for it, so later runs can find them without asking the API; also
+holds the short-lived claims that keep two runs from creating the same episode
+"""
+
+import time
+
+import database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episode_keys (
+    channel_id TEXT NOT NULL,
+    service_date TEXT NOT NULL,
+    episode_id TEXT NOT NULL,
+    episode_time_id TEXT,
+    created_at REAL,
+    completed_at REAL,
+    PRIMARY KEY (channel_id, service_date)
+);
+CREATE TABLE IF NOT EXISTS episode_claims (
+    channel_id TEXT NOT NULL,
+    service_date TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    PRIMARY KEY (channel_id, service_date)
+);
+CREATE TABLE IF NOT EXISTS upcoming_broadcasts (
+    channel_id TEXT NOT NULL,
+    service_date TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    scheduled_start_time TEXT,
+    PRIMARY KEY (channel_id, service_date)
+);
+"""
+
+# Seconds after which a claim left behind by a crashed run no longer blocks creation
+CLAIM_TTL = 600
+
+
+def _add_completed_at(connection):
+    # Stores written before completion was tracked
+    columns = [row['name'] for row in connection.execute("PRAGMA table_info(episode_keys)")]
+    if 'completed_at' not in columns:
+        connection.execute("ALTER TABLE episode_keys ADD COLUMN completed_at REAL")
+
+
+database.register(SCHEMA, migrate=_add_completed_at)
+
+
+def save_episode(channel_id, service_date, episode_id, episode_time_id=None):
+    """Remember the ids of the episode created for a channel's service date
+
+    The episode is not complete until mark_complete() records that its embed
+    and library publication were written.
+    """
+    with database.lock:
+        db = database.connect()
+        db.execute(
+            """INSERT INTO episode_keys (channel_id, service_date, episode_id, episode_time_id, created_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(channel_id, service_date) DO UPDATE SET
+                   episode_id = excluded.episode_id,
+                   episode_time_id = COALESCE(excluded.episode_time_id, episode_keys.episode_time_id)""",
+            (str(channel_id), service_date.isoformat(), episode_id, episode_time_id, time.time())
+        )
+        db.commit()
+
+
+def mark_complete(channel_id, service_date):
+    """Record that the episode's embed and library publication were written"""
+    with database.lock:
+        db = database.connect()
+        db.execute(
+            "UPDATE episode_keys SET completed_at = ? WHERE channel_id = ? AND service_date = ?",
+            (time.time(), str(channel_id), service_date.isoformat())
+        )
+        db.commit()
+
+
+def load_episode(channel_id, service_date):
+    """Return {'episode_id', 'episode_time_id', 'complete'} for a channel's service date, or None"""
+    with database.lock:
+        row = database.connect().execute(
+            """SELECT episode_id, episode_time_id, completed_at IS NOT NULL AS complete
+               FROM episode_keys WHERE channel_id = ? AND service_date = ?""",
+            (str(channel_id), service_date.isoformat())
+        ).fetchone()
+    if row is None:
+        return None
+    return dict(row, complete=bool(row['complete']))
+
+
+def claim_episode(channel_id, service_date, ttl=CLAIM_TTL):
+    """Claim the creation of a channel's service date; False while another run holds the claim
+
+    The claim is one INSERT in the shared database file, so it also holds
+    between processes (a cron retry overlapping the first run).
+    """
+    with database.lock:
+        db = database.connect()
+        now = time.time()
+        db.execute(
+            "DELETE FROM episode_claims WHERE channel_id = ? AND service_date = ? AND claimed_at < ?",
+            (str(channel_id), service_date.isoformat(), now - ttl)
+        )
+        cursor = db.execute(
+            "INSERT OR IGNORE INTO episode_claims (channel_id, service_date, claimed_at) VALUES (?, ?, ?)",
+            (str(channel_id), service_date.isoformat(), now)
+        )
+        db.commit()
+    return cursor.rowcount == 1
+
+
+def release_claim(channel_id, service_date):
+    with database.lock:
+        db = database.connect()
+        db.execute(
+            "DELETE FROM episode_claims WHERE channel_id = ? AND service_date = ?",
+            (str(channel_id), service_date.isoformat())
+        )
+        db.commit()
+
+
+def save_broadcast(channel_id, service_date, video_id, scheduled_start_time):
+    """Remember the YouTube broadcast scheduled for a channel's service date"""
+    with database.lock:
+        db = database.connect()
+        db.execute(
+            """INSERT INTO upcoming_broadcasts (channel_id, service_date, video_id, scheduled_start_time)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(channel_id, service_date) DO UPDATE SET
+                   video_id = excluded.video_id,
+                   scheduled_start_time = excluded.scheduled_start_time""",
+            (channel_id, service_date.isoformat(), video_id, scheduled_start_time)
+        )
+        db.commit()
+
+
+def load_broadcast(channel_id, service_date):
+    """Return {'video_id', 'scheduled_start_time'} for a channel's service date, or None"""
+    with database.lock:
+        row = database.connect().execute(
+            "SELECT video_id, scheduled_start_time FROM upcoming_broadcasts WHERE channel_id = ? AND service_date = ?",
+            (channel_id, service_date.isoformat())
+        ).fetchone()
+    return dict(row) if row else None
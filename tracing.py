@@ -0,0 +1,140 @@
+"""
+Run tracing
+Spans for each pipeline step and HTTP call (duration, status, bytes, retries), exported as JSON
+lines and summarised in a per-run latency table
+"""
+
+import atexit
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from decouple import config
+
+import run_log
+
+# Finished spans are appended here at exit (and by flush()), e.g. TRACE_FILE=traces.jsonl;
+# the file only grows, so the export is off unless set
+TRACE_FILE = config('TRACE_FILE', default='')
+
+_spans = []
+_spans_lock = threading.Lock()
+_stack = threading.local()
+
+
+class Span:
+    """One timed operation; kind is 'step' for pipeline steps and 'http' for API calls"""
+
+    def __init__(self, name, kind, parent, attributes):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.status = 'ok'
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record(self):
+        return {
+            'trace_id': run_log.run_id(),
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start': self.started.isoformat(),
+            'duration_ms': round(self.duration * 1000, 2),
+            'status': self.status,
+            **self.attributes,
+        }
+
+
+def current():
+    stack = getattr(_stack, 'spans', None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name, kind='step', **attributes):
+    """Time the block as a span; log lines inside a step span carry step=name"""
+    trace = Span(name, kind, current(), attributes)
+    if not hasattr(_stack, 'spans'):
+        _stack.spans = []
+    _stack.spans.append(trace)
+
+    try:
+        if kind == 'step':
+            with run_log.context(step=name):
+                yield trace
+        else:
+            yield trace
+    except BaseException as e:
+        trace.status = 'error'
+        trace.attributes.setdefault('error', str(e) or type(e).__name__)
+        raise
+    finally:
+        trace.duration = time.perf_counter() - trace._start
+        _stack.spans.pop()
+        with _spans_lock:
+            _spans.append(trace)
+
+
+def finished():
+    """Spans finished since the last flush()"""
+    with _spans_lock:
+        return list(_spans)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def report(spans=None):
+    """Latency breakdown table: one row per step, then one per HTTP method and host"""
+    spans = finished() if spans is None else spans
+    if not spans:
+        return "No spans recorded"
+
+    groups = OrderedDict()
+    for trace in sorted(spans, key=lambda trace: (trace.kind != 'step', trace.started)):
+        groups.setdefault((trace.kind, trace.name), []).append(trace)
+
+    header = f"{'span':<44} {'count':>6} {'total s':>9} {'avg ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>6} {'retries':>7} {'KiB':>8}"
+    lines = ["Latency breakdown", header, '-' * len(header)]
+
+    for (kind, name), group in groups.items():
+        durations = [trace.duration * 1000 for trace in group]
+        errors = sum(1 for trace in group if trace.status != 'ok')
+        retries = sum(trace.attributes.get('retries', 0) for trace in group)
+        size = sum(trace.attributes.get('bytes', 0) for trace in group) / 1024
+        label = f"{'http ' if kind == 'http' else ''}{name}"[:44]
+        lines.append(
+            f"{label:<44} {len(group):>6} {sum(durations) / 1000:>9.2f} {sum(durations) / len(group):>9.1f} "
+            f"{_percentile(durations, 0.95):>9.1f} {max(durations):>9.1f} {errors:>6} {retries:>7} {size:>8.1f}"
+        )
+
+    return '\n'.join(lines)
+
+
+def flush(path=TRACE_FILE):
+    """Append finished spans to the JSON-lines exporter file and forget them"""
+    with _spans_lock:
+        spans = list(_spans)
+        _spans.clear()
+
+    if path and spans:
+        with open(path, "a") as f:
+            f.write(''.join(json.dumps(trace.record(), default=str) + "\n" for trace in spans))
+    return spans
+
+
+atexit.register(flush)
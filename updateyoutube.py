@@ -1,12 +1,26 @@
 #imports
+import argparse
 import json
-import requests
-from requests.auth import HTTPBasicAuth
+import http_client
+from http_client import PCO_API, YOUTUBE_API
+import episode_cache
+import state_store
+import channels
+import episode_engine
+import video_details
+import live_broadcast
+import websub
+import tracing
+import metrics
+import healthcheck
+from write_coalescer import WriteCoalescer
+from run_log import RunLogger
 import os
 from decouple import config
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
 #define main function
 
 APP_ID = config('App_ID')
@@ -16,108 +30,197 @@ auth = {'application_id':APP_ID,'secret':SECRET}
 # Setup logging
 LOG_FILE = "updateyoutube.log"
 
-def log_message(message, also_print=True):
-    """Write message to log file and optionally print to console"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_entry = f"[{timestamp}] {message}\n"
+# Seconds past the scheduled start to wait for a pre-resolved broadcast to go live
+LIVE_WAIT = 300
 
-    with open(LOG_FILE, "a") as f:
-        f.write(log_entry)
+# Seconds between live searches when WebSub pushes are expected (they are only the fallback then)
+PUSH_FALLBACK_INTERVAL = 60
 
-    if also_print:
-        print(message)
+# Lines are written by a background thread and flushed at exit (see run_log.py)
+_log = RunLogger(LOG_FILE)
+log_message = _log.log_message
+log_separator = _log.log_separator
 
-def log_separator():
-    """Write separator line with timestamp to log file"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    separator = f"{'='*50} {timestamp} {'='*50}\n"
+def healthcheck_url(channel='sunday'):
+    """The channel's live check - gets the start, fail and success pings of each run (see healthcheck.py)"""
+    return healthcheck.channel_url(channels.get(channel), 'live')
 
-    with open(LOG_FILE, "a") as f:
-        f.write(separator)
-
-def main():
+def main(channel='sunday'):
     #get most recent PCO sermon and update it once a live video is found at the specified youtube channel
     log_separator()
-    log_message("=== Starting updateyoutube.py ===")
+    log_message(f"=== Starting updateyoutube.py ({channel}) ===")
+
+    # PCO and YouTube ids, start time and title come from the channel table (channels.py)
+    channel = channels.get(channel)
+    if not channel['live']:
+        log_message(f"ERROR: Channel {channel['name']} is not streamed live")
+        sys.exit(f"Channel {channel['name']} is not streamed live")
 
     apitoken = os.environ.get('YTKEY')
     if not apitoken:
         log_message("ERROR: YTKEY environment variable not found")
-        return
+        sys.exit("YTKEY environment variable not found")
 
-    today = datetime.now().date()
-    serviceDate = today.strftime('%B %d, %Y')
-    serviceDate = 'Sunday, ' + serviceDate
-    log_message(f"Looking for episode: {serviceDate}")
+    # The live update is what the quota reserve is held back for - never refuse its calls
+    http_client.youtube_quota.priority = 'live'
+
+    # Subscribe before the episode lookups so the hub has verified us by the time we wait
+    receiver = None
+    if websub.CALLBACK_URL and not websub.SECRET:
+        log_message("WARNING: WEBSUB_CALLBACK is set without WEBSUB_SECRET - WebSub stays off, polling only")
+    if websub.enabled():
+        try:
+            receiver = websub.shared_receiver(channel['youtube_channel_id'])
+            log_message(f"WebSub receiver listening on port {receiver.port} for {websub.CALLBACK_URL}")
+        except Exception as e:
+            log_message(f"WARNING: Could not start WebSub receiver ({e}) - polling only")
+            receiver = None
 
-    pcoURL = 'https://api.planningcenteronline.com/publishing/v2/channels/3708/episodes?order=-published_live_at&page=1&where[search]=' + serviceDate
+    pcoChannelId = channel['pco_channel_id']
+    youtubeChannelId = channel['youtube_channel_id']
 
-    try:
-        res = requests.get(pcoURL,auth=HTTPBasicAuth(APP_ID,SECRET))
+    # The same day main.py created the episode for (see daemon.LIVE_LEAD)
+    serviceDay = episode_engine.next_service_date(channel)
+    serviceDate = channel['title'].format(date=serviceDay)
+    log_message(f"Looking for episode: {serviceDate}")
 
-        if res.status_code != 200:
-            log_message(f"ERROR: Failed to get episode from PCO. HTTP {res.status_code}")
-            log_message(f"Response: {res.text}")
-            return
+    # main.py records the ids it created this morning - zero PCO round trips
+    handoff = state_store.load_episode(pcoChannelId, serviceDay)
 
-        res_json = res.json()
+    if handoff:
+        episodeId = handoff["episode_id"]
+        log_message(f"Found episode ID: {episodeId} (from main.py)")
+    else:
+        try:
+            # Read from the local cache; a fresh cache answers without any PCO request
+            wasFresh = episode_cache.is_fresh(pcoChannelId)
+            index = episode_cache.load_index(pcoChannelId)
 
-        if 'data' not in res_json or len(res_json['data']) == 0:
-            log_message(f"ERROR: No episodes found for {serviceDate}")
-            return
+            if serviceDay not in index and wasFresh:
+                # Created since the last sync - pull just the changes
+                episode_cache.sync(pcoChannelId)
+                index = episode_cache.load_index(pcoChannelId)
 
-        episodeId = res_json["data"][0]["id"]
-        log_message(f"Found episode ID: {episodeId}")
+            if serviceDay not in index:
+                log_message(f"ERROR: No episodes found for {serviceDate}")
+                sys.exit(f"No episode found for {serviceDate}")
 
-    except Exception as e:
-        log_message(f"ERROR: Failed to parse episode response: {e}")
-        return
+            episodeId = index[serviceDay]["episode_id"]
+            log_message(f"Found episode ID: {episodeId}")
+
+        except Exception as e:
+            log_message(f"ERROR: Failed to parse episode response: {e}")
+            sys.exit(f"Could not find the episode for {serviceDate}: {e}")
 
     #episodeId = res['data'][0]['id']
     #need to get back listing from youtube to update embed url accordingly
     #query episode id for starttimeid and assign youtube url
-    startsAt = today.strftime('%Y-%m-%d')
-    startsAt = startsAt + 'T13:45:00Z'
-    youtubeUrl = 'https://api.planningcenteronline.com/publishing/v2/episodes/' + episodeId + '/episode_times'
-
-    try:
-        getepres = requests.get(youtubeUrl,auth=HTTPBasicAuth(APP_ID,SECRET))
+    startsAt = episode_engine.starts_at(channel, serviceDay)
+    youtubeUrl = PCO_API + '/episodes/' + episodeId + '/episode_times'
+
+    if handoff and handoff["episode_time_id"]:
+        cachedTimeIds = [handoff["episode_time_id"]]
+    else:
+        cachedTimeIds = episode_cache.episode_time_ids(episodeId)
+
+    if cachedTimeIds:
+        episodeTimeId = cachedTimeIds[0]
+        log_message(f"Found episode time ID: {episodeTimeId} (cached)")
+    else:
+        try:
+            with tracing.span('episode_times_lookup'):
+                getepres = http_client.get(youtubeUrl)
 
-        if getepres.status_code != 200:
-            log_message(f"ERROR: Failed to get episode times. HTTP {getepres.status_code}")
-            log_message(f"Response: {getepres.text}")
-            return
+            if getepres.status_code != 200:
+                log_message(f"ERROR: Failed to get episode times. HTTP {getepres.status_code}")
+                log_message(f"Response: {getepres.text}")
+                sys.exit(f"Could not get the episode times for {episodeId}: HTTP {getepres.status_code}")
 
-        getepres_json = getepres.json()
+            getepres_json = getepres.json()
 
-        if 'data' not in getepres_json or len(getepres_json['data']) == 0:
-            log_message("ERROR: No episode times found")
-            return
+            if 'data' not in getepres_json or len(getepres_json['data']) == 0:
+                log_message("ERROR: No episode times found")
+                sys.exit(f"Episode {episodeId} has no episode times")
 
-        episodeTimeId = getepres_json["data"][0]["id"]
-        log_message(f"Found episode time ID: {episodeTimeId}")
+            episodeTimeId = getepres_json["data"][0]["id"]
+            episode_cache.record_episode_time(getepres_json["data"][0], episodeId)
+            log_message(f"Found episode time ID: {episodeTimeId}")
 
-    except Exception as e:
-        log_message(f"ERROR: Failed to parse episode times: {e}")
-        return
+        except Exception as e:
+            log_message(f"ERROR: Failed to parse episode times: {e}")
+            sys.exit(f"Could not get the episode times for {episodeId}: {e}")
 
     #print(getepres)
     #episodeTimeId = getepres['data'][0]['id']
     #print(episodeTimeId)
-    episodeTimeURL = 'https://api.planningcenteronline.com/publishing/v2/episodes/'+ episodeId + '/episode_times/'+ episodeTimeId
+    episodeTimeURL = PCO_API + '/episodes/'+ episodeId + '/episode_times/'+ episodeTimeId
     #episodeTimeId = getepres['data'][0]['id']
     #create a wait timer to get a valid youtube video id or else fail out the file
     def GetYoutubeVideoId(apitoken):
-        youtubeLiveUrl = 'https://www.googleapis.com/youtube/v3/search?part=snippet&eventType=live&maxResults=1&order=date&type=video&key=' + apitoken  + '&channelId=UCryZmERAkR6-fktliKiCGNA'
+        # A broadcast scheduled for the service day (found by main.py or here with one upcoming search)
+        # only needs its state confirmed - 1 quota unit per check instead of 100 per search
+        try:
+            broadcast = live_broadcast.pre_resolve(apitoken, serviceDay, youtubeChannelId)
+        except Exception as e:
+            log_message(f"WARNING: Could not look up the scheduled broadcast: {e}")
+            broadcast = None
+
+        if broadcast:
+            scheduledStart = live_broadcast.parse_time(broadcast['scheduled_start_time'])
+            deadline = max(datetime.now(timezone.utc), scheduledStart) + timedelta(seconds=LIVE_WAIT)
+            log_message(f"Waiting for scheduled broadcast {broadcast['video_id']} (scheduled {broadcast['scheduled_start_time']})...")
+            try:
+                liveId = live_broadcast.wait_until_live(broadcast['video_id'], apitoken, deadline, scheduledStart,
+                                                        log=log_message, notifications=receiver,
+                                                        channel_id=youtubeChannelId)
+                if liveId:
+                    log_message(f"Found live stream: {liveId}")
+                    return liveId
+            except Exception as e:
+                log_message(f"WARNING: Could not confirm the scheduled broadcast: {e}")
+            log_message("Scheduled broadcast not confirmed - falling back to live search")
+
+        youtubeLiveUrl = YOUTUBE_API + '/search?part=snippet&eventType=live&maxResults=1&order=date&type=video&key=' + apitoken  + '&channelId=' + youtubeChannelId
+
+        # With WebSub a push ends each wait early, so the 100-unit searches can be spread out
+        searchInterval = PUSH_FALLBACK_INTERVAL if receiver else 10
+        attempts = LIVE_WAIT // searchInterval
+
+        def waitForPush(seconds):
+            # Sleep out the whole interval unless a push turns out to be our live stream;
+            # pushes for edited or deleted videos must not cut the wait (and burn a search)
+            if receiver is None:
+                time.sleep(seconds)
+                return None
+            deadline = time.monotonic() + seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                entries = receiver.wait(remaining)
+                if not entries:
+                    continue
+                log_message(f"WebSub push for {', '.join(entry['video_id'] for entry in entries)}")
+                try:
+                    liveId = live_broadcast.live_notification(entries, apitoken, channel_id=youtubeChannelId)
+                except Exception as e:
+                    log_message(f"WARNING: Could not check pushed video: {e}")
+                    continue
+                if liveId:
+                    return liveId
 
         log_message("Searching for live YouTube stream...")
-        for attempt in range(30):  # 30 attempts with 10-second intervals = 5 minutes
+        for attempt in range(attempts):  # 5 minutes: every 10 seconds, or every minute with WebSub
                 # Make the request
+                metrics.count('live_poll_attempts', method='search')
                 try:
-                        getYoutubeLive = requests.get(youtubeLiveUrl)
+                        getYoutubeLive = http_client.get(youtubeLiveUrl)
                         if getYoutubeLive.status_code != 200:
-                            log_message(f"Attempt {attempt + 1}/30: YouTube API returned status {getYoutubeLive.status_code}")
-                            time.sleep(10)
+                            log_message(f"Attempt {attempt + 1}/{attempts}: YouTube API returned status {getYoutubeLive.status_code}")
+                            pushedId = waitForPush(searchInterval)
+                            if pushedId:
+                                log_message(f"Found live stream: {pushedId}")
+                                return pushedId
                             continue
 
                         getYoutubeLive_json = getYoutubeLive.json()
@@ -128,21 +231,24 @@ def main():
                             log_message(f"Found live stream: {youtubeLiveId}")
                             return youtubeLiveId
                         else:
-                            log_message(f"Attempt {attempt + 1}/30: No live stream found yet")
+                            log_message(f"Attempt {attempt + 1}/{attempts}: No live stream found yet")
                 except (KeyError, IndexError) as e:
-                        log_message(f"Attempt {attempt + 1}/30: Error parsing response - {e}")
+                        log_message(f"Attempt {attempt + 1}/{attempts}: Error parsing response - {e}")
                 except Exception as e:
-                        log_message(f"Attempt {attempt + 1}/30: Unexpected error - {e}")
+                        log_message(f"Attempt {attempt + 1}/{attempts}: Unexpected error - {e}")
 
-                # Wait for 10 seconds before making the request again
-                time.sleep(10)
+                # Wait before searching again - or less, if a pushed video turns out to be live
+                pushedId = waitForPush(searchInterval)
+                if pushedId:
+                    log_message(f"Found live stream: {pushedId}")
+                    return pushedId
 
         # If no live stream found, try to get the most recent stream from the channel
         log_message("No live stream found after 5 minutes. Attempting to get most recent stream...")
         try:
             # Get most recent uploaded video from the channel (not filtered by eventType=live)
-            recentStreamUrl = 'https://www.googleapis.com/youtube/v3/search?part=snippet&channelId=UCryZmERAkR6-fktliKiCGNA&maxResults=1&order=date&type=video&key=' + apitoken
-            recentStreamResponse = requests.get(recentStreamUrl)
+            recentStreamUrl = YOUTUBE_API + '/search?part=snippet&channelId=' + youtubeChannelId + '&maxResults=1&order=date&type=video&key=' + apitoken
+            recentStreamResponse = http_client.get(recentStreamUrl)
 
             if recentStreamResponse.status_code != 200:
                 log_message(f"Failed to get recent streams: HTTP {recentStreamResponse.status_code}")
@@ -166,7 +272,8 @@ def main():
     
     #print(getepres)
     try:
-        youtubeVideoId = GetYoutubeVideoId(apitoken)
+        with tracing.span('youtube_poll'):
+            youtubeVideoId = GetYoutubeVideoId(apitoken)
         #youtubeEmbed = '{\"data\":{\"attributes\":{\"starts_at\":'+startsAt+',\"video_embed_code\":\"<iframe width=\\\"560\\\" height=\\\"315\\\" src=\\\"https://www.youtube.com/embed/'+ youtubeVideoId +'?autoplay=1&amp;playsinline=1\\\" frameborder=\\\"0\\\" allow=\\\"accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; web-share\\\" allowfullscreen></iframe>\\\\"}}}'
         #youtubeEmbed = '{\"data\":{\"attributes\":{\"starts_at\":'+startsAt+',\"video_embed_code\":\"<iframe width=\\\"560\\\" height=\\\"315\\\" src=\\\"https://www.youtube.com/embed/'+ youtubeVideoId +'\\\" frameborder=\\\"0\\\" allow=\\\"accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; web-share\\\" allowfullscreen></iframe>\\\\"}}}'
         
@@ -174,83 +281,82 @@ def main():
             "data": {
                 "attributes": {
                     "starts_at": startsAt,
-                    "video_embed_code": (
-                        f"<iframe width='560' height='315' "
-                        f"src='https://www.youtube.com/embed/{youtubeVideoId}' "
-                        "frameborder='0' allow='accelerometer; autoplay; "
-                        "clipboard-write; encrypted-media; gyroscope; "
-                        "picture-in-picture; web-share' allowfullscreen></iframe>"
-                    )
+                    "video_embed_code": channels.VIDEO_EMBED.format(video_id=youtubeVideoId)
                 }
             }
         }
 
-        log_message(f"\nUpdating episode with YouTube video ID: {youtubeVideoId}")
-        patchIframe = requests.patch(episodeTimeURL,auth=HTTPBasicAuth(APP_ID,SECRET),json=youtubeEmbed)
-
-        if patchIframe.status_code not in [200, 201]:
-            log_message(f"WARNING: Episode time iframe patch returned HTTP {patchIframe.status_code}")
-            log_message(f"Response: {patchIframe.text}")
-        else:
-            log_message(f"✓ Episode time iframe updated successfully (HTTP {patchIframe.status_code})")
-
-        # Log patchIframe attributes
-        log_file = "pco_patch_log.txt"
-
-        with open(log_file, "a") as f:
-            f.write("=== YouTube Embed Payload ===\n")
-            f.write(json.dumps(youtubeEmbed, indent=2))  # nicely formatted JSON
-            f.write("\n" + "="*20 + "\n")
-            f.write("=== PATCH Response ===\n")
-            f.write(f"Status: {patchIframe.status_code}\n")
-            try:
-                f.write(json.dumps(patchIframe.json(), indent=2))
-            except Exception:
-                f.write(patchIframe.text)  # fallback if response is not JSON
-            f.write("\n" + "="*20 + "\n\n")
+        # Viewers land on the episode page now: the embed PATCH runs alongside the
+        # description fetch and the merged episode PATCH that follows it
+        detectedAt = time.monotonic()
 
-        libraryVideoURL = 'https://www.youtube.com/watch?v=' + youtubeVideoId
-        libraryPayload = {"data": {"attributes": {"library_video_url": libraryVideoURL}}}
+        def updateEmbed():
+            log_message(f"\nUpdating episode with YouTube video ID: {youtubeVideoId}")
+            with tracing.span('embed_patch'):
+                patchIframe = http_client.patch(episodeTimeURL,json=youtubeEmbed)
 
-        pcoEpisodeURL = 'https://api.planningcenteronline.com/publishing/v2/episodes/' + episodeId
-        log_message(f"\nUpdating library video URL...")
-        addLibrary = requests.patch(pcoEpisodeURL,auth=HTTPBasicAuth(APP_ID,SECRET),json=libraryPayload)
-
-        if addLibrary.status_code not in [200, 201]:
-            log_message(f"WARNING: Library video URL patch returned HTTP {addLibrary.status_code}")
-            log_message(f"Response: {addLibrary.text}")
-        else:
-            log_message(f"✓ Library video URL updated successfully (HTTP {addLibrary.status_code})")
+            if patchIframe.status_code not in [200, 201]:
+                log_message(f"WARNING: Episode time iframe patch returned HTTP {patchIframe.status_code}")
+                log_message(f"Response: {patchIframe.text}")
+            else:
+                log_message(f"✓ Episode time iframe updated successfully (HTTP {patchIframe.status_code})")
 
-        log_message(f"\nFetching YouTube video description...")
-        youtubeVideoUrl = 'https://www.googleapis.com/youtube/v3/videos?part=snippet&id=' + youtubeVideoId + '&key=' + apitoken
-        youtubeVideoResponse = requests.get(youtubeVideoUrl)
+            # Log patchIframe attributes
+            log_file = "pco_patch_log.txt"
 
-        if youtubeVideoResponse.status_code != 200:
-            log_message(f"WARNING: Failed to get YouTube video details. HTTP {youtubeVideoResponse.status_code}")
-        else:
-            youtubeVideoObject = youtubeVideoResponse.json()
-            if 'items' in youtubeVideoObject and len(youtubeVideoObject['items']) > 0:
-                youtubeVideoDescription = youtubeVideoObject['items'][0]['snippet']['description']
-                log_message(f"✓ Retrieved video description ({len(youtubeVideoDescription)} characters)")
-
-                summaryPayload = {
-                    "data": {
-                        "attributes": {
-                            "description": youtubeVideoDescription
-                        }
-                    }
-                }
-                log_message(f"\nUpdating episode description...")
-                addSummary = requests.patch(pcoEpisodeURL,auth=HTTPBasicAuth(APP_ID,SECRET),json=summaryPayload)
-
-                if addSummary.status_code not in [200, 201]:
-                    log_message(f"WARNING: Episode description patch returned HTTP {addSummary.status_code}")
-                    log_message(f"Response: {addSummary.text}")
-                else:
-                    log_message(f"✓ Episode description updated successfully (HTTP {addSummary.status_code})")
+            with open(log_file, "a") as f:
+                f.write("=== YouTube Embed Payload ===\n")
+                f.write(json.dumps(youtubeEmbed, indent=2))  # nicely formatted JSON
+                f.write("\n" + "="*20 + "\n")
+                f.write("=== PATCH Response ===\n")
+                f.write(f"Status: {patchIframe.status_code}\n")
+                try:
+                    f.write(json.dumps(patchIframe.json(), indent=2))
+                except Exception:
+                    f.write(patchIframe.text)  # fallback if response is not JSON
+                f.write("\n" + "="*20 + "\n\n")
+
+        def updateEpisode():
+            # Library URL and description go to the same episode - one merged PATCH
+            pcoEpisodeURL = PCO_API + '/episodes/' + episodeId
+            episodeWrites = WriteCoalescer()
+            libraryVideoURL = 'https://www.youtube.com/watch?v=' + youtubeVideoId
+            episodeWrites.stage(pcoEpisodeURL, library_video_url=libraryVideoURL)
+
+            log_message(f"\nFetching YouTube video description...")
+            try:
+                with tracing.span('description_fetch'):
+                    youtubeVideoDescription = video_details.get_description(youtubeVideoId, apitoken)
+            except Exception as e:
+                log_message(f"WARNING: Failed to get YouTube video details. {e}")
             else:
-                log_message("WARNING: No video details found in YouTube response")
+                if youtubeVideoDescription is not None:
+                    log_message(f"✓ Retrieved video description ({len(youtubeVideoDescription)} characters)")
+                    episodeWrites.stage(pcoEpisodeURL, description=youtubeVideoDescription)
+                else:
+                    log_message("WARNING: No video details found in YouTube response")
+
+            log_message(f"\nUpdating episode library video URL and description...")
+            with tracing.span('library_patch'):
+                results = episodeWrites.flush()
+            for result in results:
+                if result['merged']:
+                    log_message(f"✓ Episode updated successfully (HTTP {result['response'].status_code}): {', '.join(result['attributes'])}")
+                    continue
+                for name in result['attributes']:
+                    if name in result['failed']:
+                        log_message(f"WARNING: Episode {name} patch failed - {result['failed'][name]}")
+                    else:
+                        log_message(f"✓ Episode {name} updated successfully")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pending = [pool.submit(updateEmbed), pool.submit(updateEpisode)]
+            for future in pending:
+                future.result()
+
+        updateSeconds = time.monotonic() - detectedAt
+        log_message(f"\nLive stream detected to episode fully updated: {updateSeconds:.2f}s")
+        metrics.gauge('live_update_seconds', round(updateSeconds, 3))
 
         log_message("\n=== Update completed successfully ===")
 
@@ -264,12 +370,31 @@ def main():
         log_message(tb_stream.getvalue(), also_print=False)
         # Also print to console
         traceback.print_exc()
-        exit()
+        sys.exit(f"Update failed: {e}")
 
 if __name__ == "__main__":
+        parser = argparse.ArgumentParser(description="Point the next service episode at the channel's live stream")
+        parser.add_argument('--channel', default='sunday', help="channel to update (default: sunday)")
+        args = parser.parse_args()
+
+        # Pings are queued and sent in the background - they never hold up the run
+        monitor = healthcheck.Monitor(healthcheck_url(args.channel))
+        monitor.start()
+        succeeded = False
         try:
-                main()
-        except Fail:
-                sys.exit()
+                main(args.channel)
+        except SystemExit as e:
+                # main() exits with the reason when it fails
+                monitor.fail(str(e.code))
+                sys.exit(e.code or 1)
+        except Exception as e:
+                monitor.fail(f"{type(e).__name__}: {e}")
+                raise
         else:
-                pingConfirm = requests.get('https://hc-ping.com/78356338-0428-4f04-ad71-b3f805264745')
+                succeeded = True
+                monitor.success(0)
+        finally:
+                log_message(f"HTTP retries: {http_client.retry_policy.stats.summary()}")
+                log_message(f"YouTube quota: {http_client.youtube_quota.summary()}")
+                log_message(tracing.report())
+                metrics.write('updateyoutube', succeeded)
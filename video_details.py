@@ -0,0 +1,78 @@
+"""
+Batched YouTube video details
+Fetches video snippets through videos.list 50 ids at a time and keeps them in a small LRU cache
+"""
+
+import threading
+from collections import OrderedDict
+
+import http_client
+from http_client import YOUTUBE_API
+
+# videos.list accepts at most 50 ids per request
+BATCH_SIZE = 50
+
+# Snippets kept in memory before the least recently used are evicted
+CACHE_SIZE = 500
+
+_snippets = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cached(video_id):
+    with _lock:
+        snippet = _snippets.get(video_id)
+        if snippet is not None:
+            _snippets.move_to_end(video_id)
+        return snippet
+
+
+def _store(video_id, snippet):
+    with _lock:
+        _snippets[video_id] = snippet
+        _snippets.move_to_end(video_id)
+        while len(_snippets) > CACHE_SIZE:
+            _snippets.popitem(last=False)
+
+
+def remember(video_id, snippet):
+    """Cache a snippet fetched elsewhere (e.g. alongside liveStreamingDetails)"""
+    _store(video_id, snippet)
+
+
+def fetch_snippets(video_ids, api_key):
+    """Return {video id: snippet} for the given ids
+
+    Cached ids cost nothing; the rest are requested in batches of BATCH_SIZE.
+    Ids YouTube does not return (private or deleted videos) are left out.
+    """
+    snippets = {}
+    missing = []
+
+    for video_id in dict.fromkeys(video_ids):
+        snippet = _cached(video_id)
+        if snippet is not None:
+            snippets[video_id] = snippet
+        else:
+            missing.append(video_id)
+
+    for start in range(0, len(missing), BATCH_SIZE):
+        batch = missing[start:start + BATCH_SIZE]
+        response = http_client.get(
+            f"{YOUTUBE_API}/videos",
+            params={'part': 'snippet', 'id': ','.join(batch), 'key': api_key}
+        )
+        if response.status_code != 200:
+            raise Exception(f"YouTube API error: {response.status_code}")
+
+        for item in response.json().get('items', []):
+            _store(item['id'], item['snippet'])
+            snippets[item['id']] = item['snippet']
+
+    return snippets
+
+
+def get_description(video_id, api_key):
+    """Description of one video, or None when YouTube has no details for it"""
+    snippet = fetch_snippets([video_id], api_key).get(video_id)
+    return snippet['description'] if snippet else None
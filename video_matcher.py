@@ -0,0 +1,79 @@
+"""
+Service-to-video matching engine
+Assigns YouTube videos to service dates in one sorted pass, at most one video per service
+and at most one service per video
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+# Videos published more than this many days from the service are never matched
+MAX_DAYS = 3
+
+
+def sunday_service_score(title):
+    """Default title scorer - anything scoring 0 is not a candidate"""
+    return 1.0 if 'SUNDAY SERVICE' in (title or '').upper() else 0.0
+
+
+def publish_date(video):
+    return datetime.strptime(video['published_at'][:10], '%Y-%m-%d').date()
+
+
+class PublishDateIndex:
+    """Videos sorted by publish date, answering "published between a and b" with two bisects"""
+
+    def __init__(self, videos):
+        self.videos = sorted(videos, key=lambda video: video['published_at'])
+        self.ordinals = [publish_date(video).toordinal() for video in self.videos]
+
+    def between(self, start_date, end_date):
+        """Positions of the videos published on or between two dates"""
+        lo = bisect_left(self.ordinals, start_date.toordinal())
+        hi = bisect_right(self.ordinals, end_date.toordinal())
+        return range(lo, hi)
+
+
+def match_services(service_dates, videos, scorer=sunday_service_score, max_days=MAX_DAYS):
+    """Return {service date: match} for every service date that gets a video
+
+    videos are dicts with video_id, title and published_at. Each match has the
+    shape returned by search_youtube_for_sunday_service (video_id, title,
+    published_at, date_diff). Candidate pairs are taken closest first (then by
+    title score, then earliest service), so when two Sundays fall within
+    max_days of the same upload it goes to the nearer one and the other
+    Sunday gets its next best candidate, if any.
+    """
+    scored = []
+    for video in videos:
+        score = scorer(video['title'])
+        if score > 0:
+            scored.append(dict(video, score=score))
+
+    index = PublishDateIndex(scored)
+    window = timedelta(days=max_days)
+
+    candidates = []
+    for service_date in sorted(set(service_dates)):
+        for position in index.between(service_date - window, service_date + window):
+            date_diff = abs(index.ordinals[position] - service_date.toordinal())
+            candidates.append((date_diff, -index.videos[position]['score'], service_date, position))
+
+    candidates.sort()
+
+    matches = {}
+    taken = set()
+    for date_diff, _, service_date, position in candidates:
+        if service_date in matches or position in taken:
+            continue
+
+        video = index.videos[position]
+        matches[service_date] = {
+            'video_id': video['video_id'],
+            'title': video['title'],
+            'published_at': video['published_at'],
+            'date_diff': date_diff
+        }
+        taken.add(position)
+
+    return matches
@@ -0,0 +1,269 @@
+"""
+YouTube WebSub (PubSubHubbub) receiver
+Subscribes a small local HTTP server to each live channel's Atom feed so new and updated videos
+are pushed to the scripts as they happen instead of being found by polling
+"""
+
+import atexit
+import hashlib
+import hmac
+import queue
+import threading
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from decouple import config
+
+import http_client
+from youtube_catalogue import YOUTUBE_CHANNEL_ID
+
+HUB_URL = config('WEBSUB_HUB', default='https://pubsubhubbub.appspot.com/subscribe')
+
+# Public URL the hub can reach the receiver on (e.g. through a reverse proxy); WebSub is off when unset
+CALLBACK_URL = config('WEBSUB_CALLBACK', default='')
+
+# The hub reaches the receiver through CALLBACK_URL, so it only listens locally unless told otherwise
+LISTEN_HOST = config('WEBSUB_HOST', default='127.0.0.1')
+LISTEN_PORT = config('WEBSUB_PORT', default=8089, cast=int)
+
+# Shared with the hub to sign notifications (X-Hub-Signature); WebSub stays off without it, since
+# anyone reaching the port could otherwise push any video
+SECRET = config('WEBSUB_SECRET', default='')
+
+# Subscriptions only need to outlive one run; the hub drops them after this many seconds
+LEASE_SECONDS = config('WEBSUB_LEASE', default=3600, cast=int)
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+YT = '{http://www.youtube.com/xml/schemas/2015}'
+TOMBSTONE = '{http://purl.org/atompub/tombstones/1.0}'
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def topic_url(channel_id=YOUTUBE_CHANNEL_ID):
+    return f"https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"
+
+
+def enabled():
+    return bool(CALLBACK_URL and SECRET)
+
+
+def parse_atom(body):
+    """Return one dict per video in a notification
+
+    Each has video_id, channel_id, title, published, updated and deleted
+    (True for at:deleted-entry tombstones, which only carry the id and the
+    channel in at:by).
+    """
+    root = ET.fromstring(body)
+    entries = []
+
+    for entry in root.findall(f'{ATOM}entry'):
+        entries.append({
+            'video_id': entry.findtext(f'{YT}videoId'),
+            'channel_id': entry.findtext(f'{YT}channelId'),
+            'title': entry.findtext(f'{ATOM}title'),
+            'published': entry.findtext(f'{ATOM}published'),
+            'updated': entry.findtext(f'{ATOM}updated'),
+            'deleted': False,
+        })
+
+    for tombstone in root.findall(f'{TOMBSTONE}deleted-entry'):
+        entries.append({
+            'video_id': tombstone.get('ref', '').rsplit(':', 1)[-1],
+            'channel_id': (tombstone.findtext(f'{TOMBSTONE}by/{ATOM}uri') or '').rsplit('/', 1)[-1] or None,
+            'title': None,
+            'published': None,
+            'updated': tombstone.get('when'),
+            'deleted': True,
+        })
+
+    return entries
+
+
+def signature_valid(body, header, secret=SECRET):
+    """Check an X-Hub-Signature header ("sha1=<hex>") against the body"""
+    if not secret:
+        return True
+    if not header or '=' not in header:
+        return False
+
+    method, digest = header.split('=', 1)
+    if method not in ('sha1', 'sha256', 'sha384', 'sha512'):
+        return False
+    expected = hmac.new(secret.encode(), body, getattr(hashlib, method)).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+def _request_subscription(mode, callback, topic, hub, secret, lease_seconds):
+    data = {'hub.mode': mode, 'hub.topic': topic, 'hub.callback': callback, 'hub.verify': 'async'}
+    if mode == 'subscribe':
+        data['hub.lease_seconds'] = lease_seconds
+        if secret:
+            data['hub.secret'] = secret
+
+    response = http_client.post(hub, data=data)
+    if response.status_code not in [202, 204]:
+        raise Exception(f"WebSub hub error: {response.status_code} {response.text[:200]}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Intent verification: echo the challenge for topics we asked for
+        params = {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+        receiver = self.server.receiver
+
+        if params.get('hub.topic') not in receiver.topics or 'hub.challenge' not in params:
+            return self._reply(404)
+
+        receiver.verified.set()
+        self._reply(200, params['hub.challenge'].encode())
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        receiver = self.server.receiver
+
+        # Anything 2xx tells the hub it was delivered; bad pushes are dropped, not refused
+        self._reply(204)
+
+        if not signature_valid(body, self.headers.get('X-Hub-Signature'), receiver.secret):
+            receiver.rejected += 1
+            return
+        try:
+            entries = parse_atom(body)
+        except ET.ParseError:
+            receiver.rejected += 1
+            return
+
+        for entry in entries:
+            # A push naming a channel we did not subscribe to did not come from our subscription
+            channel_queue = receiver.queues.get(entry['channel_id'])
+            if channel_queue is None:
+                receiver.rejected += 1
+                continue
+            channel_queue.put(entry)
+
+
+class Receiver:
+    """Local WebSub subscriber
+
+    start() binds the HTTP server and subscribes to each channel's feed;
+    the hub then verifies the subscriptions and pushes Atom notifications,
+    which are parsed and queued per channel. wait() hands one channel's to
+    the caller. Pushes must be signed with the secret and name a subscribed
+    channel.
+    """
+
+    def __init__(self, callback=CALLBACK_URL, hub=HUB_URL, host=LISTEN_HOST, port=LISTEN_PORT,
+                 secret=SECRET, channel_ids=(YOUTUBE_CHANNEL_ID,), lease_seconds=LEASE_SECONDS):
+        self.callback = callback
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.topics = {}
+        self.queues = {}
+        for channel_id in channel_ids:
+            self.add_channel(channel_id)
+        self.lease_seconds = lease_seconds
+        self.verified = threading.Event()
+        self.rejected = 0
+        self._server = None
+
+    def start(self, subscribe=True):
+        if not self.secret:
+            raise ValueError("WebSub needs WEBSUB_SECRET - unsigned pushes are not accepted")
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.receiver = self
+        self.port = self._server.server_port
+        threading.Thread(target=self._server.serve_forever, name='websub-receiver', daemon=True).start()
+
+        if subscribe:
+            self.subscribe()
+        return self
+
+    def add_channel(self, channel_id):
+        """Accept pushes for channel_id (subscribe() asks the hub for them)"""
+        self.topics[topic_url(channel_id)] = channel_id
+        self.queues.setdefault(channel_id, queue.Queue())
+
+    def subscribe(self, channel_id=None):
+        """Ask the hub for (or renew) one channel's subscription, or every channel's
+
+        The hub verifies the callback asynchronously.
+        """
+        for topic, topic_channel in list(self.topics.items()):
+            if channel_id is None or topic_channel == channel_id:
+                _request_subscription('subscribe', self.callback, topic, self.hub, self.secret, self.lease_seconds)
+
+    def stop(self, unsubscribe=True):
+        if self._server is None:
+            return
+        if unsubscribe:
+            for topic in self.topics:
+                try:
+                    _request_subscription('unsubscribe', self.callback, topic, self.hub, self.secret, self.lease_seconds)
+                except Exception:
+                    pass  # the lease expires on its own
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+    def wait(self, timeout, channel_id=YOUTUBE_CHANNEL_ID):
+        """Block up to timeout seconds for one channel's notifications; returns every one queued (maybe none)"""
+        notifications = self.queues[channel_id]
+        entries = []
+
+        try:
+            entries.append(notifications.get(timeout=max(timeout, 0)))
+        except queue.Empty:
+            return entries
+
+        while True:
+            try:
+                entries.append(notifications.get_nowait())
+            except queue.Empty:
+                return entries
+
+
+class Subscription:
+    """One channel's side of a shared Receiver: wait() only returns that channel's pushes"""
+
+    def __init__(self, receiver, channel_id):
+        self.receiver = receiver
+        self.channel_id = channel_id
+        self.port = receiver.port
+
+    def wait(self, timeout):
+        return self.receiver.wait(timeout, self.channel_id)
+
+
+def shared_receiver(channel_id=YOUTUBE_CHANNEL_ID):
+    """channel_id's subscription on the process-wide receiver, which is started on first use and stopped at exit
+
+    Each call (the daemon runs every live channel's update every week)
+    renews that channel's subscription and drops its pushes queued since the
+    last run. Channels share the one listening port.
+    """
+    global _shared
+
+    with _shared_lock:
+        if _shared is None:
+            _shared = Receiver(channel_ids=()).start(subscribe=False)
+            atexit.register(_shared.stop)
+        _shared.add_channel(channel_id)
+        _shared.wait(0, channel_id)
+        _shared.subscribe(channel_id)
+        return Subscription(_shared, channel_id)
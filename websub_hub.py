@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the YouTube WebSub hub
+Accepts subscriptions, verifies the callback like the real hub does, then replays recorded Atom
+notifications (fixtures/websub/*.xml) to it so the push path can be exercised offline
+
+    python websub_hub.py --port 8090 --delay 5 fixtures/websub/old_video_updated.xml fixtures/websub/live_started.xml
+    WEBSUB_HUB=http://127.0.0.1:8090/subscribe WEBSUB_CALLBACK=http://127.0.0.1:8089/ WEBSUB_SECRET=test python updateyoutube.py
+"""
+
+import argparse
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import requests
+
+
+def log(message):
+    print(f"[hub] {message}", flush=True)
+
+
+def verify(callback, mode, topic, lease_seconds):
+    """Intent verification: the callback must echo a random challenge"""
+    challenge = secrets.token_hex(16)
+    params = {'hub.mode': mode, 'hub.topic': topic, 'hub.challenge': challenge}
+    if mode == 'subscribe':
+        params['hub.lease_seconds'] = lease_seconds
+
+    try:
+        response = requests.get(callback, params=params, timeout=5)
+    except requests.RequestException as e:
+        log(f"verification of {callback} failed: {e}")
+        return False
+
+    verified = response.status_code == 200 and response.text == challenge
+    log(f"{mode} {callback} {'verified' if verified else f'NOT verified (HTTP {response.status_code})'}")
+    return verified
+
+
+def replay(callback, secret, payloads, delay):
+    for path in payloads:
+        time.sleep(delay)
+        with open(path, 'rb') as f:
+            body = f.read()
+
+        headers = {'Content-Type': 'application/atom+xml'}
+        if secret:
+            headers['X-Hub-Signature'] = 'sha1=' + hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+
+        try:
+            response = requests.post(callback, data=body, headers=headers, timeout=5)
+            log(f"pushed {path} -> HTTP {response.status_code}")
+        except requests.RequestException as e:
+            log(f"push of {path} failed: {e}")
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+        form = {key: values[0] for key, values in parse_qs(body).items()}
+
+        mode = form.get('hub.mode')
+        callback = form.get('hub.callback')
+        topic = form.get('hub.topic')
+        if mode not in ('subscribe', 'unsubscribe') or not callback or not topic:
+            self.send_response(400)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        # Like the real hub: accept now, verify and deliver asynchronously
+        self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+        def run():
+            if not verify(callback, mode, topic, form.get('hub.lease_seconds', '')):
+                return
+            if mode == 'subscribe':
+                replay(callback, form.get('hub.secret'), self.server.payloads, self.server.delay)
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded YouTube WebSub notifications to subscribers")
+    parser.add_argument('payloads', nargs='+', help="Atom files pushed in order after each subscription")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--delay', type=float, default=5.0, help="seconds before each push")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.payloads = args.payloads
+    server.delay = args.delay
+
+    log(f"listening on http://{args.host}:{server.server_port}/subscribe")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
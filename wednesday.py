@@ -1,43 +1,27 @@
 #imports
-import json
-import requests
-from requests.auth import HTTPBasicAuth
-import os
-from decouple import config
+import channels
+import episode_engine
+from run_log import RunLogger
 from datetime import date, timedelta
 #define main function
 
-APP_ID = config('App_ID')
-SECRET = config('Secret')
-auth = {'application_id':APP_ID,'secret':SECRET}
+# Setup logging
+LOG_FILE = "wednesday.log"
+
+# Lines are written by a background thread and flushed at exit (see run_log.py)
+_log = RunLogger(LOG_FILE)
+log_message = _log.log_message
+log_separator = _log.log_separator
 
 def main():
-    #create new service and return episode id
-    url = 'https://api.planningcenteronline.com/publishing/v2/channels/12961/episodes'
+    #create next Wednesday's service - run the day after, so it is six days out
+    log_separator()
+    log_message("=== Starting wednesday.py ===")
+
+    channel = channels.get('wednesday')
     today = date.today() + timedelta(days=6)
-    serviceDate = today.strftime('%B %d, %Y\"')
-    serviceDate = '\"Wednesday, ' + serviceDate
-    payload= '{\"data\":{\"attributes\":{\"title\":'+serviceDate+'}}}'
-    headers = {}
-    res = requests.post(url,auth=HTTPBasicAuth(APP_ID,SECRET),data=payload).json()
-    episodeId = res['data']['id']
-    #query episode id for starttimeid and assign youtube url
-    startsAt = today.strftime('\"%Y-%m-%d')
-    startsAt = startsAt + 'T13:45:00Z\"'
-    youtubeEmbed = '{\"data\":{\"attributes\":{\"starts_at\":'+startsAt+',\"video_embed_code\":\"<iframe width=\\\"560\\\" height=\\\"315\\\" src=\\\"https://www.youtube.com/embed/FBy7kse0Wvc\\\" frameborder=\\\"0\\\" allow=\\\"accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture\\\" allowfullscreen></iframe>\"}}}'
-    print(youtubeEmbed)
-    youtubeUrl = 'https://api.planningcenteronline.com/publishing/v2/episodes/' + episodeId + '/episode_times'
-    getepres = requests.get(youtubeUrl,auth=HTTPBasicAuth(APP_ID,SECRET),data=youtubeEmbed).json()
-    #print(getepres)
-    episodeTimeId = getepres['data'][0]['id']
-    print(episodeTimeId)
-    episodeTimeURL = 'https://api.planningcenteronline.com/publishing/v2/episodes/'+ episodeId + '/episode_times/'+ episodeTimeId
-    patchIframe = requests.patch(episodeTimeURL,auth=HTTPBasicAuth(APP_ID,SECRET),data=youtubeEmbed)
-    print(patchIframe)
-    libraryUrl = 'https://api.planningcenteronline.com/publishing/v2/episodes/'+ episodeId +'/'
-    libraryData = '{\"data\":{\"attributes\":{\"published_to_library_at\":'+startsAt+'}}}'
-    addLibrary = requests.patch(libraryUrl,auth=HTTPBasicAuth(APP_ID,SECRET),data=libraryData)
-    #print(addLibrary)
+    if not episode_engine.create_episode(channel, today, log=log_message):
+        raise Exception(f"Could not create the episode for {today}")
 
 if __name__ == "__main__":
     main()
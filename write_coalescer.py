@@ -0,0 +1,63 @@
+"""
+Coalesced JSON:API attribute writes
+Gathers attribute changes per resource and sends one merged PATCH for each, falling back to
+one PATCH per attribute if the merged write is rejected
+"""
+
+from collections import OrderedDict
+
+import http_client
+
+
+class WriteCoalescer:
+    """Pending attribute writes keyed by resource URL
+
+    stage() can be called any number of times for the same resource; later
+    values for an attribute replace earlier ones. flush() sends the writes in
+    the order the resources were first staged.
+    """
+
+    def __init__(self):
+        self.pending = OrderedDict()
+
+    def stage(self, url, **attributes):
+        self.pending.setdefault(url, {}).update(attributes)
+
+    def _patch(self, url, attributes):
+        try:
+            response = http_client.patch(url, json={"data": {"attributes": attributes}})
+        except Exception as e:
+            return None, str(e)
+        if response.status_code in [200, 201]:
+            return response, None
+        return response, f"HTTP {response.status_code}: {response.text[:200]}"
+
+    def flush(self):
+        """Send every pending write and return one result dict per resource
+
+        Each result has url, attributes, merged (True when the single merged
+        PATCH succeeded), response (the last successful response, or None) and
+        failed ({attribute: error} for attributes that could not be written).
+        """
+        results = []
+
+        while self.pending:
+            url, attributes = self.pending.popitem(last=False)
+            response, error = self._patch(url, attributes)
+            result = {'url': url, 'attributes': attributes, 'merged': error is None,
+                      'response': response if error is None else None, 'failed': {}}
+
+            if error is not None and len(attributes) > 1:
+                # One bad attribute should not block the others
+                for name, value in attributes.items():
+                    response, error = self._patch(url, {name: value})
+                    if error is None:
+                        result['response'] = response
+                    else:
+                        result['failed'][name] = error
+            elif error is not None:
+                result['failed'] = {name: error for name in attributes}
+
+            results.append(result)
+
+        return results
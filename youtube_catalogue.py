@@ -0,0 +1,167 @@
+"""
+YouTube video catalogue
+Local copy of the channel's uploads playlist, read through playlistItems.list (1 quota unit per page)
+instead of search.list (100 units per call)
+"""
+
+import time
+from datetime import timedelta
+
+import http_client
+from http_client import YOUTUBE_API
+import database
+from video_matcher import MAX_DAYS, match_services
+
+YOUTUBE_CHANNEL_ID = 'UCryZmERAkR6-fktliKiCGNA'
+
+# playlistItems.list maximum page size
+PAGE_SIZE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS youtube_videos (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    title TEXT,
+    published_at TEXT
+);
+CREATE INDEX IF NOT EXISTS youtube_videos_by_date ON youtube_videos (channel_id, published_at);
+CREATE TABLE IF NOT EXISTS youtube_catalogue_state (
+    channel_id TEXT PRIMARY KEY,
+    uploads_playlist_id TEXT,
+    synced_at REAL
+);
+"""
+
+database.register(SCHEMA)
+
+
+def uploads_playlist_id(api_key, channel_id=YOUTUBE_CHANNEL_ID):
+    """Return the channel's uploads playlist id, asking channels.list only the first time"""
+    with database.lock:
+        row = database.connect().execute(
+            "SELECT uploads_playlist_id FROM youtube_catalogue_state WHERE channel_id = ?",
+            (channel_id,)
+        ).fetchone()
+    if row and row['uploads_playlist_id']:
+        return row['uploads_playlist_id']
+
+    response = http_client.get(
+        f"{YOUTUBE_API}/channels",
+        params={'part': 'contentDetails', 'id': channel_id, 'key': api_key}
+    )
+    if response.status_code != 200:
+        raise Exception(f"YouTube API error: {response.status_code}")
+
+    items = response.json().get('items', [])
+    if not items:
+        raise Exception(f"YouTube channel {channel_id} not found")
+
+    playlist_id = items[0]['contentDetails']['relatedPlaylists']['uploads']
+
+    with database.lock:
+        db = database.connect()
+        db.execute(
+            """INSERT INTO youtube_catalogue_state (channel_id, uploads_playlist_id) VALUES (?, ?)
+               ON CONFLICT(channel_id) DO UPDATE SET uploads_playlist_id = excluded.uploads_playlist_id""",
+            (channel_id, playlist_id)
+        )
+        db.commit()
+
+    return playlist_id
+
+
+def sync(api_key, channel_id=YOUTUBE_CHANNEL_ID):
+    """Add uploads newer than the catalogue's newest video
+
+    The uploads playlist lists the newest video first, so paging stops at the
+    first video that is already catalogued. Returns the number of new videos.
+    """
+    playlist_id = uploads_playlist_id(api_key, channel_id)
+
+    with database.lock:
+        known = {
+            row['video_id'] for row in database.connect().execute(
+                "SELECT video_id FROM youtube_videos WHERE channel_id = ?", (channel_id,)
+            )
+        }
+
+    params = {
+        'part': 'snippet,contentDetails',
+        'playlistId': playlist_id,
+        'maxResults': PAGE_SIZE,
+        'key': api_key,
+    }
+    new_videos = []
+
+    while True:
+        response = http_client.get(f"{YOUTUBE_API}/playlistItems", params=params)
+        if response.status_code != 200:
+            raise Exception(f"YouTube API error: {response.status_code}")
+
+        data = response.json()
+        caught_up = False
+
+        for item in data.get('items', []):
+            video_id = item['contentDetails']['videoId']
+            if video_id in known:
+                caught_up = True
+                break
+
+            # videoPublishedAt is when the video (or stream) went public;
+            # snippet.publishedAt is only when it was added to the playlist
+            published_at = item['contentDetails'].get('videoPublishedAt') or item['snippet']['publishedAt']
+            new_videos.append((video_id, channel_id, item['snippet']['title'], published_at))
+
+        next_page = data.get('nextPageToken')
+        if caught_up or not next_page:
+            break
+        params['pageToken'] = next_page
+
+    with database.lock:
+        db = database.connect()
+        db.executemany(
+            """INSERT INTO youtube_videos (video_id, channel_id, title, published_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT(video_id) DO UPDATE SET title = excluded.title, published_at = excluded.published_at""",
+            new_videos
+        )
+        db.execute(
+            "UPDATE youtube_catalogue_state SET synced_at = ? WHERE channel_id = ?",
+            (time.time(), channel_id)
+        )
+        db.commit()
+
+    return len(new_videos)
+
+
+def videos_between(start_date, end_date, channel_id=YOUTUBE_CHANNEL_ID):
+    """Catalogued videos published on or between two dates, oldest first"""
+    with database.lock:
+        rows = database.connect().execute(
+            """SELECT video_id, title, published_at FROM youtube_videos
+               WHERE channel_id = ? AND published_at >= ? AND published_at < ?
+               ORDER BY published_at""",
+            (channel_id, start_date.isoformat(), (end_date + timedelta(days=1)).isoformat())
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def match_sunday_services(service_dates, max_days=MAX_DAYS, channel_id=YOUTUBE_CHANNEL_ID):
+    """Return {service date: Sunday Service video} for the dates that have one
+
+    Reads the catalogue once for the whole range and assigns videos with
+    video_matcher.match_services, so no upload is used for two Sundays.
+    """
+    if not service_dates:
+        return {}
+
+    videos = videos_between(min(service_dates) - timedelta(days=max_days),
+                            max(service_dates) + timedelta(days=max_days), channel_id)
+    return match_services(service_dates, videos, max_days=max_days)
+
+
+def find_sunday_service(service_date, max_days=MAX_DAYS, channel_id=YOUTUBE_CHANNEL_ID):
+    """Return the catalogued Sunday Service video closest to service_date, or None
+
+    Same result shape as backfill_episodes.search_youtube_for_sunday_service.
+    """
+    return match_sunday_services([service_date], max_days, channel_id).get(service_date)